@@ -22,6 +22,7 @@ setup(
     packages_data={"urpameasure": ["py.typed"]},
     packages=["urpameasure"],
     install_requires=[],
+    entry_points={"console_scripts": ["urpameasure=urpameasure.__main__:main"]},
     python_requires=">=3.7",
     classifiers=[
         "Intended Audience :: Developers",
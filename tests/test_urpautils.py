@@ -1,9 +1,19 @@
 """Module containing all unit tests for urpameasure"""
+import os
+import pathlib
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
 import pytest
 from contextlib import nullcontext as does_not_raise_error
 from freezegun import freeze_time
 
+import urpa
 import urpameasure
+from urpameasure import traffic
 from urpameasure.globals import MeasurementIdExistsError, InvalidMeasurementIdError, SourceIdTooLongError
 
 MEASUREMENT_NAME_1 = "measurement"
@@ -126,6 +136,131 @@ class Test_console:
                 measure._get_measured_time("a")
             measure._remove_time_measure_file()
 
+    def test_status_rules(self, monkeypatch):
+        """Test status is derived from thresholds if not provided"""
+        written = []
+        monkeypatch.setattr(urpa, "write_measure", lambda **kwargs: written.append(kwargs["status"]))
+        measure = urpameasure.Console()
+        measure.add(MEASUREMENT_NAME_1, default_tolerance=1, warning_above=10, error_above=20, error_below=0)
+        for value in (5, 11.5, 10.5, 25, -2):
+            measure.write(MEASUREMENT_NAME_1, value=value)
+        measure.write(MEASUREMENT_NAME_1, value=25, status=urpameasure.INFO)
+        measure.write(MEASUREMENT_NAME_1, value=25, tolerance=10)
+        assert written == [
+            urpameasure.SUCCESS,
+            urpameasure.WARNING,
+            urpameasure.SUCCESS,
+            urpameasure.ERROR,
+            urpameasure.ERROR,
+            urpameasure.INFO,
+            urpameasure.WARNING,
+        ]
+        # no value to compare with
+        measure.write(MEASUREMENT_NAME_1)
+        assert written[-1] == urpameasure.NONE
+        # time measure derives status too and falls back to INFO without thresholds
+        measure.add(MEASUREMENT_NAME_2)
+        measure._send_time_measure(MEASUREMENT_NAME_1, 30)
+        measure._send_time_measure(MEASUREMENT_NAME_2, 30)
+        assert written[-2:] == [urpameasure.ERROR, urpameasure.INFO]
+        # resetting to defaults writes the default status, status is derived from default value with provided tolerance
+        measure.edit_default_value(MEASUREMENT_NAME_1, "default_value", 15)
+        measure.write(MEASUREMENT_NAME_1)
+        assert written[-1] == urpameasure.NONE
+        measure.write(MEASUREMENT_NAME_1, tolerance=1)
+        assert written[-1] == urpameasure.WARNING
+        measure.add("reset", default_value=0, error_below=1)
+        measure.clear_all()
+        assert written[-3:] == [urpameasure.NONE] * 3
+        # editing a threshold recompiles the rule, also if it is edited directly
+        measure.edit_default_value(MEASUREMENT_NAME_1, "error_above", None)
+        measure.write(MEASUREMENT_NAME_1, value=25)
+        assert written[-1] == urpameasure.WARNING
+        measure.measurements[MEASUREMENT_NAME_1]["warning_above"] = None
+        measure.write(MEASUREMENT_NAME_1, value=25)
+        assert written[-1] == urpameasure.SUCCESS
+        with pytest.raises(ValueError):
+            measure.edit_default_value(MEASUREMENT_NAME_1, "warning_below", -1)
+        with pytest.raises(ValueError):
+            measure.add("abc", warning_above=5, error_above=1)
+
+    def test_measure_resources(self, monkeypatch):
+        """Test resource usage is sent to companion measurements"""
+        written = {}
+        monkeypatch.setattr(urpa, "write_measure", lambda **kwargs: written.update({kwargs["id"]: kwargs}))
+        measure = urpameasure.Console()
+        measure.add("cpu")
+        measure.add("rss")
+        with pytest.raises(InvalidMeasurementIdError):
+            measure.measure_resources(cpu_id="abc")
+
+        @measure.measure_resources(cpu_id="cpu", rss_id="rss")
+        def busy():
+            sum(range(100000))
+
+        busy()
+        # process time has coarse resolution on Windows, the busy loop may not reach the next tick
+        assert written["cpu"]["value"] >= 0
+        assert written["cpu"]["status"] == urpameasure.INFO
+        if urpameasure.take_resource_snapshot().max_rss is not None:
+            assert written["rss"]["value"] >= 0
+        written.clear()
+        with pytest.raises(ZeroDivisionError):
+            with measure.measure_resources(cpu_id="cpu", status=urpameasure.NONE):
+                1 / 0
+        assert not written
+        with measure.measure_resources(cpu_id="cpu", status=urpameasure.NONE):
+            pass
+        assert written["cpu"]["status"] == urpameasure.NONE
+
+    def test_measure_resources_threads(self, monkeypatch):
+        """Test threads running the same decorated function use their own start snapshots"""
+        written = []
+        monkeypatch.setattr(urpa, "write_measure", lambda **kwargs: written.append(kwargs["value"]))
+        cpu_times = iter([1.0, 10.0, 2.0, 20.0])
+        monkeypatch.setattr(
+            sys.modules["urpameasure.urpameasure"],
+            "take_resource_snapshot",
+            lambda: urpameasure.ResourceSnapshot(next(cpu_times), None, None, None),
+        )
+        measure = urpameasure.Console()
+        measure.add("cpu")
+        # enter first, enter second, exit first, exit second
+        steps = [threading.Event() for _ in range(3)]
+
+        @measure.measure_resources(cpu_id="cpu")
+        def work(entered, leave):
+            entered.set()
+            leave.wait(5)
+
+        first = threading.Thread(target=work, args=(steps[0], steps[1]))
+        first.start()
+        steps[0].wait(5)
+        second = threading.Thread(target=work, args=(steps[1], steps[2]))
+        second.start()
+        first.join(5)
+        steps[2].set()
+        second.join(5)
+        assert written == [1.0, 10.0]
+
+    def test_measure_time_decorator(self, monkeypatch, tmp_path):
+        """Test measure_time decorator with fake clock"""
+        monkeypatch.chdir(tmp_path)
+        written = []
+        monkeypatch.setattr(urpa, "write_measure", lambda **kwargs: written.append(kwargs["value"]))
+        clock = urpameasure.FakeClock(1000)
+        measure = urpameasure.Console(clock=clock)
+        measure.add(MEASUREMENT_NAME_1)
+
+        @measure.measure_time(MEASUREMENT_NAME_1, time_unit=urpameasure.MINUTES)
+        def main():
+            clock.advance(90)
+
+        main()
+        assert written == [1.5]
+        with pytest.raises(ValueError):
+            measure.measure_time(MEASUREMENT_NAME_1, time_unit="a")
+
     @pytest.mark.skip(reason="idk how to test this or even if I should")
     def test_measure_login(self):
         """test measure_login decorator"""
@@ -197,6 +332,541 @@ class Test_sydesk:
             assert measure._get_measured_time() == 60
             measure._remove_time_measure_file()
 
+    def test_measure_resources(self, monkeypatch):
+        """Test zero resource usage is sent instead of default value"""
+        written = []
+        monkeypatch.setattr(urpa, "write_sydesk_measure", lambda *args: written.append((args[1], args[2])))
+        snapshot = urpameasure.ResourceSnapshot(1.5, 1024, 0, 0)
+        monkeypatch.setattr(sys.modules["urpameasure.urpameasure"], "take_resource_snapshot", lambda: snapshot)
+        measure = urpameasure.Sydesk("path/to/dir")
+        measure.add("cpu", "cpu", default_value=50)
+        measure.add("rss", "rss", default_value=50)
+        with measure.measure_resources(cpu_id="cpu", rss_id="rss"):
+            pass
+        assert written == [("cpu", 0), ("rss", 0)]
+
+
+class Test_availability:
+    """Tests for pre-aggregated login availability"""
+
+    def test_login_statistics(self):
+        """Test rolling counters over the last attempts and time window"""
+        statistics = urpameasure.LoginStatistics(max_attempts=4, window=100)
+        assert statistics.availability() is None
+        assert statistics.mean_time_to_login() is None
+        statistics.record(False, 1, now=0)
+        statistics.record(True, 2, now=10)
+        statistics.record(True, 4, now=20)
+        statistics.record(False, 1, now=30)
+        statistics.record(False, 1, now=40)
+        # first attempt was dropped
+        assert statistics.availability() == 50
+        assert statistics.mean_time_to_login() == 3
+        assert statistics.consecutive_failures == 2
+        statistics.expire(now=115)
+        # attempt at 10 is outside of the window
+        assert statistics.availability() == pytest.approx(100 / 3)
+        assert statistics.mean_time_to_login() == 4
+        statistics.record(True, 6, now=116)
+        assert statistics.consecutive_failures == 0
+        with pytest.raises(ValueError):
+            urpameasure.LoginStatistics(max_attempts=0)
+
+    def test_measure_login_availability(self, monkeypatch):
+        """Test decorator sends summarized measures at most once per interval"""
+        written = []
+        monkeypatch.setattr(urpa, "write_measure", lambda **kwargs: written.append((kwargs["id"], kwargs["value"])))
+        clock = urpameasure.FakeClock()
+        measure = urpameasure.Console(clock=clock)
+        measure.add("login")
+        measure.add("failures")
+        measure.add("login time")
+        with pytest.raises(InvalidMeasurementIdError):
+            measure.measure_login_availability("login", failures_id="abc")
+
+        @measure.measure_login_availability("login", "failures", "login time", interval=60)
+        def login(fail):
+            clock.advance(2)
+            if fail:
+                raise RuntimeError("login failed")
+            return "logged in"
+
+        assert login(False) == "logged in"
+        assert written == [("login", 100), ("failures", 0), ("login time", 2)]
+        with pytest.raises(RuntimeError):
+            login(True)
+        # the first failure after a success is sent immediately
+        assert written[3:] == [("login", 50), ("failures", 1), ("login time", 2)]
+        with pytest.raises(RuntimeError):
+            login(True)
+        # interval did not pass yet
+        assert len(written) == 6
+        clock.advance(60)
+        with pytest.raises(RuntimeError):
+            login(True)
+        assert written[6:] == [("login", 25), ("failures", 3), ("login time", 2)]
+        measure.send_login_availability("login")
+        assert len(written) == 12
+        with pytest.raises(InvalidMeasurementIdError):
+            measure.send_login_availability("failures")
+
+        # another function decorated with the same id shares the statistics
+        @measure.measure_login_availability("login", "failures", "login time", interval=60)
+        def login_again():
+            clock.advance(2)
+
+        login_again()
+        assert measure.login_statistics["login"].consecutive_failures == 0
+        assert len(measure.login_statistics["login"].attempts) == 5
+        with pytest.raises(ValueError):
+            measure.measure_login_availability("login", "failures", max_attempts=10)
+        with pytest.raises(ValueError):
+            measure.measure_login_availability("login", "failures", "login time", interval=30)
+        # statistics which were not sent because of the interval are sent at exit
+        with pytest.raises(RuntimeError):
+            login(True)
+        with pytest.raises(RuntimeError):
+            login(True)
+        assert written[-3:] == [("login", pytest.approx(100 * 2 / 6)), ("failures", 1), ("login time", 2)]
+        send_unsent_login_availability = sys.modules["urpameasure.urpameasure"]._send_unsent_login_availability
+        send_unsent_login_availability(weakref.ref(measure))
+        assert written[-3:] == [("login", pytest.approx(100 * 2 / 7)), ("failures", 2), ("login time", 2)]
+        count = len(written)
+        send_unsent_login_availability(weakref.ref(measure))
+        assert len(written) == count
+        # sends at most once per 15 minutes by default
+        measure.add("default interval")
+
+        @measure.measure_login_availability("default interval")
+        def login_default():
+            pass
+
+        for _ in range(3):
+            login_default()
+        clock.advance(15 * 60)
+        login_default()
+        assert [value for id, value in written if id == "default interval"] == [100, 100]
+
+    def test_sydesk_login_availability(self, monkeypatch):
+        """Test Sydesk sends zero availability and failures instead of default values"""
+        written = []
+        monkeypatch.setattr(urpa, "write_sydesk_measure", lambda *args: written.append((args[1], args[2])))
+        clock = urpameasure.FakeClock()
+        measure = urpameasure.Sydesk("path/to/dir", clock=clock)
+        measure.add("login", "login", default_value=50)
+        measure.add("failures", "failures", default_value=50)
+
+        @measure.measure_login_availability("login", "failures", interval=60)
+        def login(fail):
+            if fail:
+                raise RuntimeError("login failed")
+
+        with pytest.raises(RuntimeError):
+            login(True)
+        assert written == [("login", 0), ("failures", 1)]
+        clock.advance(60)
+        login(False)
+        assert written[2:] == [("login", 50), ("failures", 0)]
+
+
+class Test_clock:
+    """Tests for time sources"""
+
+    def test_clocks(self):
+        """Test all clocks return time and fake clock moves only when told to"""
+        fake = urpameasure.FakeClock(5)
+        assert fake.now() == 5
+        fake.advance(2.5)
+        assert fake.now() == 7.5
+        monotonic = urpameasure.MonotonicClock()
+        assert monotonic.now() <= monotonic.now()
+        assert urpameasure.WallClock().now() == pytest.approx(time.time(), abs=1)
+
+    def test_coarse_clock(self):
+        """Test coarse clock follows its source with lag of its resolution"""
+        source = urpameasure.FakeClock(10)
+        clock = urpameasure.CoarseClock(resolution=0.01, source=source)
+        try:
+            assert clock.now() == 10
+            source.advance(5)
+            deadline = time.monotonic() + 5
+            while clock.now() != 15 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert clock.now() == 15
+        finally:
+            clock.stop()
+        with pytest.raises(ValueError):
+            urpameasure.CoarseClock(resolution=0)
+
+
+class Test_resources:
+    """Tests for resource usage snapshots"""
+
+    def test_resource_usage_delta(self):
+        """Test difference of two snapshots"""
+        start = urpameasure.ResourceSnapshot(1.0, 100, None, 10)
+        end = urpameasure.ResourceSnapshot(1.5, 300, 20, 30)
+        assert urpameasure.resource_usage_delta(start, end) == (0.5, 200, None, 20)
+        snapshot = urpameasure.take_resource_snapshot()
+        assert snapshot.cpu_time > 0
+
+
+class Test_write_path:
+    """Tests for the write path"""
+
+    def test_writes_use_current_measurements(self, monkeypatch):
+        """Test default values changed directly in self.measurements are used by the next write"""
+        written = []
+        monkeypatch.setattr(urpa, "write_measure", lambda **kwargs: written.append(kwargs["value"]))
+        monkeypatch.setattr(urpa, "write_sydesk_measure", lambda *args: written.append(args[2]))
+        console = urpameasure.Console()
+        console.add(MEASUREMENT_NAME_1, default_value=1)
+        sydesk = urpameasure.Sydesk("path/to/dir")
+        sydesk.add(MEASUREMENT_NAME_2, "source id", default_value=1)
+        console.write(MEASUREMENT_NAME_1)
+        sydesk.write(MEASUREMENT_NAME_2)
+        console.measurements[MEASUREMENT_NAME_1]["default_value"] = 2
+        sydesk.measurements[MEASUREMENT_NAME_2]["default_value"] = 2
+        console.write(MEASUREMENT_NAME_1)
+        sydesk.write(MEASUREMENT_NAME_2)
+        assert written == [1, 1, 2, 2]
+
+    @staticmethod
+    def _traced_writes(write, count):
+        """Returns peak traced memory and traces left by urpameasure after `count` calls of `write`"""
+        tracemalloc.start()
+        try:
+            for _ in range(count):
+                write()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        traces = snapshot.filter_traces([tracemalloc.Filter(True, f"*{os.sep}urpameasure{os.sep}*")]).traces
+        return peak, len(traces)
+
+    def test_writes_do_not_leak(self):
+        """Test memory left by writes does not grow with their number"""
+        console = urpameasure.Console()
+        console.add(MEASUREMENT_NAME_1, default_name="01 measurement", warning_above=5)
+        sydesk = urpameasure.Sydesk("path/to/dir")
+        sydesk.add(MEASUREMENT_NAME_2, "source id")
+
+        def write():
+            console.write(MEASUREMENT_NAME_1)
+            console.write(MEASUREMENT_NAME_1, value=7.5, description="foo")
+            sydesk.write(MEASUREMENT_NAME_2, value=2.5)
+
+        # first write compiles the status rule
+        write()
+        peak_few, traces_few = self._traced_writes(write, 10)
+        peak_many, traces_many = self._traced_writes(write, 1000)
+        # interpreter free lists may keep one block (keyword dict of the urpa call), a leak would keep one per write
+        assert traces_few <= 1
+        assert traces_many <= 1
+        assert peak_many <= peak_few + 256
+        assert peak_many < 4096
+
+
+class Test_history:
+    """Tests for local measurement history"""
+
+    def test_rolling_queries(self):
+        """Test min/max/mean/percentile over the last `capacity` values"""
+        history = urpameasure.MeasurementHistory(capacity=3)
+        assert history.count(MEASUREMENT_NAME_1) == 0
+        assert history.mean(MEASUREMENT_NAME_1) is None
+        for value in (5, 1, 3, 4):
+            history.record(MEASUREMENT_NAME_1, value)
+        # oldest value (5) was overwritten
+        assert history.values(MEASUREMENT_NAME_1) == [1, 3, 4]
+        assert history.count(MEASUREMENT_NAME_1) == 3
+        assert history.min(MEASUREMENT_NAME_1) == 1
+        assert history.max(MEASUREMENT_NAME_1) == 4
+        assert history.mean(MEASUREMENT_NAME_1) == pytest.approx(8 / 3)
+        assert history.percentile(MEASUREMENT_NAME_1, 50) == 3
+        assert history.percentile(MEASUREMENT_NAME_1, 100) == 4
+        with pytest.raises(ValueError):
+            history.percentile(MEASUREMENT_NAME_1, 101)
+        history.record(MEASUREMENT_NAME_1, 0)
+        history.record(MEASUREMENT_NAME_1, 0)
+        history.record(MEASUREMENT_NAME_1, 0)
+        assert history.max(MEASUREMENT_NAME_1) == 0
+
+    def test_persistence(self, tmp_path):
+        """Test history is loaded back from memory-mapped file"""
+        history = urpameasure.MeasurementHistory(capacity=3, directory=str(tmp_path))
+        for value in (5, 1, 3, 4):
+            history.record(MEASUREMENT_NAME_2, value)
+        history.close()
+        history = urpameasure.MeasurementHistory(capacity=3, directory=str(tmp_path))
+        assert history.values(MEASUREMENT_NAME_2) == [1, 3, 4]
+        assert history.min(MEASUREMENT_NAME_2) == 1
+        assert history.mean(MEASUREMENT_NAME_2) == pytest.approx(8 / 3)
+        history.record(MEASUREMENT_NAME_2, 10)
+        assert history.values(MEASUREMENT_NAME_2) == [3, 4, 10]
+        history.close()
+        with pytest.raises(ValueError):
+            # file was created with different capacity
+            urpameasure.MeasurementHistory(capacity=5, directory=str(tmp_path)).values(MEASUREMENT_NAME_2)
+
+    def test_written_values_are_recorded(self):
+        """Test Console and Sydesk record written values"""
+        history = urpameasure.MeasurementHistory()
+        console = urpameasure.Console(history=history)
+        console.add(MEASUREMENT_NAME_1)
+        console.write(MEASUREMENT_NAME_1)
+        console.write(MEASUREMENT_NAME_1, value=0)
+        console.write(MEASUREMENT_NAME_1, value=2)
+        assert history.values(MEASUREMENT_NAME_1) == [0, 2]
+        sydesk = urpameasure.Sydesk("path/to/dir", history=history)
+        sydesk.add(MEASUREMENT_NAME_2, "source id", default_value=7)
+        sydesk.write(MEASUREMENT_NAME_2)
+        sydesk.write(MEASUREMENT_NAME_2, value=5)
+        sydesk._send_login_measure(MEASUREMENT_NAME_2, 0)
+        assert history.values(MEASUREMENT_NAME_2) == [5, 0]
+
+    def test_clear_is_not_recorded(self):
+        """Test resetting measurements to default values does not skew the history"""
+        history = urpameasure.MeasurementHistory()
+        console = urpameasure.Console(history=history)
+        console.add(MEASUREMENT_NAME_1, default_value=0)
+        console.write(MEASUREMENT_NAME_1, value=5)
+        console.clear(MEASUREMENT_NAME_1)
+        console.clear_all()
+        console.write(MEASUREMENT_NAME_1, status=urpameasure.INFO)
+        assert history.values(MEASUREMENT_NAME_1) == [5]
+        sydesk = urpameasure.Sydesk("path/to/dir", history=history)
+        sydesk.add(MEASUREMENT_NAME_2, "source id", default_value=7)
+        sydesk.write(MEASUREMENT_NAME_2, value=3)
+        sydesk.clear(MEASUREMENT_NAME_2)
+        assert history.values(MEASUREMENT_NAME_2) == [3]
+
+    def test_queries_do_not_create_files(self, tmp_path):
+        """Test queries of a measurement without history neither create buffers nor files"""
+        history = urpameasure.MeasurementHistory(directory=str(tmp_path / "history"))
+        assert history.mean(MEASUREMENT_NAME_1) is None
+        assert history.min(MEASUREMENT_NAME_1) is None
+        assert history.max(MEASUREMENT_NAME_1) is None
+        assert history.percentile(MEASUREMENT_NAME_1, 50) is None
+        assert history.values(MEASUREMENT_NAME_1) == []
+        assert history.count(MEASUREMENT_NAME_1) == 0
+        with pytest.raises(ValueError):
+            history.percentile(MEASUREMENT_NAME_1, 101)
+        assert not history.buffers
+        assert not (tmp_path / "history").exists()
+        history.record(MEASUREMENT_NAME_1, 1)
+        assert len(list((tmp_path / "history").iterdir())) == 1
+        history.close()
+
+
+class Test_definition_cache:
+    """Tests for definitions shared through DefinitionCache"""
+
+    def test_console_definitions(self, tmp_path, monkeypatch):
+        """Test Console attached to shared definitions writes the same measurements"""
+        path = str(tmp_path / "console.definitions")
+        measure = urpameasure.Console()
+        measure.add(MEASUREMENT_NAME_1, default_name="01 Login", default_unit="%", warning_above=10)
+        measure.add(MEASUREMENT_NAME_2)
+        definitions = urpameasure.DefinitionCache.build(path, measure)
+        assert definitions.kind == "Console"
+        assert definitions.revision == 1
+        assert sorted(definitions) == sorted(measure.measurements)
+        assert dict(definitions[MEASUREMENT_NAME_1]) == measure.measurements[MEASUREMENT_NAME_1]
+        written = []
+        monkeypatch.setattr(urpa, "write_measure", lambda **kwargs: written.append(kwargs))
+        attached = urpameasure.Console(definitions=urpameasure.DefinitionCache(path))
+        attached.write(MEASUREMENT_NAME_1, value=20)
+        assert written[0]["name"] == "01 Login"
+        assert written[0]["unit"] == "%"
+        assert written[0]["status"] == urpameasure.WARNING
+        with pytest.raises(InvalidMeasurementIdError):
+            attached.write("abc")
+        with pytest.raises(urpameasure.ReadOnlyDefinitionsError):
+            attached.add("abc")
+        with pytest.raises(urpameasure.ReadOnlyDefinitionsError):
+            attached.edit_default_value(MEASUREMENT_NAME_1, "default_unit", "s")
+        # rebuilding the cache while processes are attached writes a new revision to its own file
+        assert not definitions.is_stale()
+        measure.add("abc")
+        rebuilt = urpameasure.DefinitionCache.build(path, measure)
+        assert rebuilt.revision == 2
+        assert rebuilt.revision_path == f"{path}.2"
+        assert "abc" in rebuilt
+        assert definitions.is_stale()
+        assert "abc" not in definitions
+        assert attached.measurements[MEASUREMENT_NAME_2]["default_name"] == "0 Unnamed measurement"
+        current = urpameasure.DefinitionCache(path)
+        assert current.revision == 2
+        with pytest.raises(ValueError):
+            # file of a revision is never rewritten
+            urpameasure.DefinitionCache.build(path, measure, revision=2)
+        for cache in (definitions, attached.measurements, rebuilt, current):
+            cache.close()
+        # files of revisions nobody is attached to are removed by the next build
+        urpameasure.DefinitionCache.build(path, measure).close()
+        assert sorted(os.listdir(str(tmp_path))) == ["console.definitions", "console.definitions.3"]
+
+    def test_concurrent_builds(self, tmp_path, monkeypatch):
+        """Test builds never reuse a revision file and attaching survives removal of the resolved revision"""
+        definition_cache = sys.modules["urpameasure.definition_cache"]
+        path = str(tmp_path / "console.definitions")
+        measure = urpameasure.Console()
+        measure.add(MEASUREMENT_NAME_1)
+        urpameasure.DefinitionCache.build(path, measure).close()
+        # revision 2 is being written by another build
+        (tmp_path / "console.definitions.2").write_bytes(b"")
+        built = urpameasure.DefinitionCache.build(path, measure)
+        assert built.revision == 3
+        assert sorted(os.listdir(str(tmp_path))) == ["console.definitions", "console.definitions.3"]
+        built.close()
+        # the revision read from `path` is removed by a build before it is opened
+        resolved = [f"{path}.1"]
+        resolve = definition_cache._resolve
+        monkeypatch.setattr(definition_cache, "_resolve", lambda path: resolved.pop() if resolved else resolve(path))
+        attached = urpameasure.DefinitionCache(path)
+        assert attached.revision == 3
+        attached.close()
+
+    def test_sydesk_definitions(self, tmp_path):
+        """Test Sydesk attached to shared definitions"""
+        path = str(tmp_path / "sydesk.definitions")
+        measure = urpameasure.Sydesk("path/to/dir")
+        measure.add(MEASUREMENT_NAME_1, "source id", default_expiration=60)
+        urpameasure.DefinitionCache.build(path, measure)
+        attached = urpameasure.Sydesk("path/to/dir", definitions=urpameasure.DefinitionCache(path))
+        assert attached.measurements[MEASUREMENT_NAME_1]["default_expiration"] == 60
+        with does_not_raise_error():
+            attached.write(MEASUREMENT_NAME_1, value=5)
+        with pytest.raises(urpameasure.ReadOnlyDefinitionsError):
+            attached.add(MEASUREMENT_NAME_2, "source id")
+        with pytest.raises(ValueError):
+            # definitions built for another class
+            urpameasure.Console(definitions=urpameasure.DefinitionCache(path))
+
+
+class Test_traffic:
+    """Tests for recording, replaying and generating measurement traffic"""
+
+    def test_record_and_replay(self, tmp_path):
+        """Test recorded traffic can be replayed"""
+        path = str(tmp_path / "traffic.jsonl")
+        console = urpameasure.Console()
+        console.add(MEASUREMENT_NAME_1)
+        sydesk = urpameasure.Sydesk("path/to/dir")
+        sydesk.add(MEASUREMENT_NAME_2, "source id")
+        original_write_measure = urpa.write_measure
+        with traffic.Recorder(path) as recorder:
+            console.write(MEASUREMENT_NAME_1, value=5)
+            sydesk.write(MEASUREMENT_NAME_2, value=3)
+        assert recorder.calls == 2
+        assert urpa.write_measure is original_write_measure
+        calls = traffic.read_recording(path)
+        assert [call["function"] for call in calls] == ["write_measure", "write_sydesk_measure"]
+        assert calls[0]["kwargs"]["value"] == 5
+        assert calls[1]["args"] == ["path/to/dir", "source id", 3, 60 * 60, ""]
+        report = traffic.replay(path, speed=0)
+        assert report.writes == 2
+        # arguments which are not JSON serializable are recorded as strings
+        directory = pathlib.Path("path", "to", "dir")
+        sydesk = urpameasure.Sydesk(directory)
+        sydesk.add(MEASUREMENT_NAME_2, "source id")
+        with traffic.Recorder(path):
+            sydesk.write(MEASUREMENT_NAME_2, value=3)
+        assert traffic.read_recording(path)[0]["args"][0] == str(directory)
+        with pytest.raises(ValueError):
+            traffic.replay(path, speed=-1)
+
+    @pytest.mark.parametrize("processes", [False, True])
+    def test_generate_load(self, processes):
+        """Test synthetic load writes every id `rate` times per second"""
+        report = traffic.generate_load(ids=4, rate=20, duration=0.2, workers=2, processes=processes)
+        assert report.writes == 4 * 4
+        # the last tick lasts until the end of the load, so throughput is not overstated
+        assert report.elapsed >= 0.2
+        assert 0 < report.throughput <= 4 * 20
+        assert report.percentile(50) <= report.percentile(100)
+        with pytest.raises(ValueError):
+            traffic.generate_load(target="abc")
+
+    def test_cli_without_urpa(self, tmp_path):
+        """Test command line interface works when urpa can't be imported"""
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(urpameasure.__file__)))
+        environment = dict(os.environ, PYTHONPATH=package_root)
+        result = subprocess.run(
+            [sys.executable, "-m", "urpameasure", "load", "--ids", "1", "--rate", "10", "--duration", "0.1"],
+            cwd=str(tmp_path),
+            env=environment,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        assert result.returncode == 0, result.stderr
+        assert "writes: 1" in result.stdout
+        # the library itself still requires urpa
+        result = subprocess.run(
+            [sys.executable, "-c", "import urpameasure"],
+            cwd=str(tmp_path),
+            env=environment,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        assert result.returncode != 0
+        assert "ModuleNotFoundError: No module named 'urpa'" in result.stderr
+
+
+class Test_heartbeat:
+    """Tests for re-sending Sydesk measurements before they expire"""
+
+    def test_scheduler(self):
+        """Test due refreshes are sent in one batch and rescheduled"""
+        clock = urpameasure.FakeClock()
+        batches = []
+        heartbeat = urpameasure.HeartbeatScheduler(batches.append, lead_time=10, clock=clock)
+        heartbeat.schedule("a", 60)
+        heartbeat.schedule("b", 60)
+        # lead time is at most half of the expiration
+        heartbeat.schedule("c", 10)
+        assert heartbeat.next_due() == 5
+        assert heartbeat.run_pending() == 0
+        clock.advance(5)
+        assert heartbeat.run_pending() == 1
+        clock.advance(45)
+        # "c" was rescheduled to 10 and is refreshed in the same batch
+        assert heartbeat.run_pending() == 3
+        assert batches[0] == ["c"]
+        assert sorted(batches[1]) == ["a", "b", "c"]
+        # rewriting an id postpones its refresh, unscheduling stops it
+        clock.advance(10)
+        heartbeat.schedule("a", 60)
+        heartbeat.unschedule("c")
+        clock.advance(40)
+        assert heartbeat.run_pending() == 1
+        assert batches[-1] == ["b"]
+        heartbeat.schedule("b", 0)
+        assert heartbeat.next_due() == 110
+
+    def test_sydesk_heartbeat(self, monkeypatch):
+        """Test Sydesk re-sends last written values from background thread"""
+        written = []
+        monkeypatch.setattr(urpa, "write_sydesk_measure", lambda *args: written.append(args))
+        measure = urpameasure.Sydesk("path/to/dir")
+        measure.add(MEASUREMENT_NAME_1, "source id", default_expiration=1)
+        measure.write(MEASUREMENT_NAME_1, value=5, description="foo")
+        heartbeat = measure.start_heartbeat(lead_time=0.9)
+        try:
+            deadline = time.monotonic() + 5
+            while len(written) < 3 and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            measure.stop_heartbeat()
+        assert measure.heartbeat is None
+        assert not heartbeat._running
+        assert len(written) >= 3
+        assert set(written) == {("path/to/dir", "source id", 5, 1, "foo")}
+
 
 class Test_miscs:
     """Test miscellaneous functions that are not directly tied to Console or Sydesk classes"""
@@ -1,4 +1,15 @@
+from . import urpa_stand_in
+
+# the package is imported before urpameasure.__main__ runs, so the stand-in has to be installed here
+urpa_stand_in.install_for_command_line_interface()
+
 from .globals import *
+from .clock import *
+from .history import *
+from .definition_cache import *
+from .resources import *
+from .availability import *
+from .heartbeat import *
 from .urpameasure import *
 from .management_console import *
 from .sydesk import *
@@ -0,0 +1,74 @@
+"""Command line interface for recording, replaying and generating measurement traffic
+
+Usage:
+    python -m urpameasure record OUTPUT SCRIPT [ARGS ...]
+    python -m urpameasure replay INPUT [--speed SPEED] [--directory DIRECTORY]
+    python -m urpameasure load [--ids N] [--rate M] [--duration SECONDS] [--workers W] [--processes]
+"""
+
+import argparse
+import runpy
+import sys
+from typing import List, Optional
+
+from .traffic import CONSOLE, SYDESK, Recorder, generate_load, replay
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    """Parses command line arguments"""
+    parser = argparse.ArgumentParser(prog="urpameasure", description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="run a robot script and record its measurement traffic")
+    record_parser.add_argument("output", help="file the traffic is recorded to")
+    record_parser.add_argument("script", help="robot script to be run")
+    record_parser.add_argument("script_args", nargs=argparse.REMAINDER, help="arguments of the robot script")
+    record_parser.add_argument(
+        "--forward", action="store_true", help="also pass recorded calls to the original urpa functions"
+    )
+
+    replay_parser = subparsers.add_parser("replay", help="replay recorded traffic against Console and Sydesk")
+    replay_parser.add_argument("input", help="file with recorded traffic")
+    replay_parser.add_argument(
+        "--speed", type=float, default=1.0, help="speed multiplier, 0 replays as fast as possible (default: 1)"
+    )
+    replay_parser.add_argument("--directory", help="overrides recorded Sydesk directory")
+
+    load_parser = subparsers.add_parser("load", help="generate synthetic measurement traffic")
+    load_parser.add_argument("--ids", type=int, default=10, help="number of measurement ids (default: 10)")
+    load_parser.add_argument("--rate", type=float, default=1.0, help="writes per second of every id (default: 1)")
+    load_parser.add_argument("--duration", type=float, default=10.0, help="duration in seconds (default: 10)")
+    load_parser.add_argument("--workers", type=int, default=1, help="number of threads or processes (default: 1)")
+    load_parser.add_argument("--processes", action="store_true", help="use processes instead of threads")
+    load_parser.add_argument("--target", choices=(CONSOLE, SYDESK), default=CONSOLE, help="(default: console)")
+    load_parser.add_argument("--directory", default=".", help="Sydesk directory (default: current directory)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point of the command line interface"""
+    args = _parse_args(argv)
+    if args.command == "record":
+        sys.argv = [args.script] + args.script_args
+        with Recorder(args.output, forward=args.forward) as recorder:
+            try:
+                runpy.run_path(args.script, run_name="__main__")
+            finally:
+                print(f"recorded {recorder.calls} calls to '{args.output}'")
+    elif args.command == "replay":
+        print(replay(args.input, speed=args.speed, directory=args.directory).summary())
+    else:
+        report = generate_load(
+            ids=args.ids,
+            rate=args.rate,
+            duration=args.duration,
+            workers=args.workers,
+            processes=args.processes,
+            target=args.target,
+            directory=args.directory,
+        )
+        print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Module containing rolling statistics of login attempts"""
+
+from __future__ import annotations
+
+import logging
+from collections import deque
+from typing import Deque, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LoginAttempt(NamedTuple):
+    """One login attempt"""
+
+    time: float
+    success: bool
+    duration: float
+
+
+class LoginStatistics:
+    """Rolling counters of the last `max_attempts` login attempts, optionally limited to the last `window` seconds
+
+    Counters are updated when attempts are added or dropped, so all queries are O(1).
+    """
+
+    def __init__(self, max_attempts: int = 100, window: Optional[float] = None):
+        """init
+
+        Args:
+            max_attempts (int, optional): number of the last attempts kept. Defaults to 100.
+            window (Optional[float], optional): attempts older than this number of seconds are dropped. Not limited if None. Defaults to None.
+
+        Raises:
+            ValueError: max_attempts or window is not positive
+        """
+        if max_attempts < 1:
+            raise ValueError(f"Number of attempts must be positive, not '{max_attempts}'")
+        if window is not None and window <= 0:
+            raise ValueError(f"Window must be positive, not '{window}'")
+        self.max_attempts = max_attempts
+        self.window = window
+        self.attempts: Deque[LoginAttempt] = deque()
+        self.consecutive_failures = 0
+        self._successes = 0
+        self._success_duration = 0.0
+
+    def _drop_oldest(self) -> None:
+        """Drops the oldest attempt and updates counters"""
+        attempt = self.attempts.popleft()
+        if attempt.success:
+            self._successes -= 1
+            self._success_duration -= attempt.duration
+
+    def expire(self, now: float) -> None:
+        """Drops attempts older than self.window
+
+        Args:
+            now (float): current time in seconds
+        """
+        if self.window is None:
+            return
+        while self.attempts and self.attempts[0].time < now - self.window:
+            self._drop_oldest()
+
+    def record(self, success: bool, duration: float, now: float) -> None:
+        """Records a login attempt
+
+        Args:
+            success (bool): whether the login succeeded
+            duration (float): duration of the attempt in seconds
+            now (float): time of the attempt in seconds
+        """
+        if len(self.attempts) == self.max_attempts:
+            self._drop_oldest()
+        self.attempts.append(LoginAttempt(now, success, duration))
+        if success:
+            self._successes += 1
+            self._success_duration += duration
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+        self.expire(now)
+
+    def availability(self) -> Optional[float]:
+        """Returns percentage of successful attempts (0 - 100) or None if there are no attempts"""
+        return self._successes / len(self.attempts) * 100 if self.attempts else None
+
+    def mean_time_to_login(self) -> Optional[float]:
+        """Returns mean duration of successful attempts in seconds or None if there are no successful attempts"""
+        return self._success_duration / self._successes if self._successes else None
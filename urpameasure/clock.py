@@ -0,0 +1,93 @@
+"""Module containing time sources used for timing measurements"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Clock(ABC):
+    """Source of time in seconds"""
+
+    @abstractmethod
+    def now(self) -> float:
+        """Returns current time in seconds"""
+        raise NotImplementedError
+
+
+class WallClock(Clock):
+    """Wall clock time (time.time). Comparable between processes, but may jump when system time is changed"""
+
+    def now(self) -> float:
+        return time.time()
+
+
+class MonotonicClock(Clock):
+    """Monotonic time (time.monotonic). Never goes backwards, but is meaningful only within one process"""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+
+class FakeClock(Clock):
+    """Clock which moves only when told to. Used for deterministic tests"""
+
+    def __init__(self, start: float = 0.0):
+        """init
+
+        Args:
+            start (float, optional): initial time in seconds. Defaults to 0.0.
+        """
+        self.time = start
+
+    def now(self) -> float:
+        return self.time
+
+    def advance(self, seconds: float) -> None:
+        """Moves the clock forward
+
+        Args:
+            seconds (float): seconds to move the clock by
+        """
+        self.time += seconds
+
+
+class CoarseClock(Clock):
+    """Clock returning time cached by a background thread, so reading it costs only an attribute lookup
+
+    The returned time lags behind `source` by at most `resolution` seconds.
+    """
+
+    def __init__(self, resolution: float = 0.01, source: Optional[Clock] = None):
+        """init
+
+        Args:
+            resolution (float, optional): how often the cached time is updated in seconds. Defaults to 0.01.
+            source (Optional[Clock], optional): clock the cached time is read from. MonotonicClock if None. Defaults to None.
+        """
+        if resolution <= 0:
+            raise ValueError(f"Resolution must be positive, not '{resolution}'")
+        self.resolution = resolution
+        self.source = source or MonotonicClock()
+        self._now = self.source.now()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="urpameasure-coarse-clock", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """Loop of the background thread updating the cached time"""
+        while not self._stopped.wait(self.resolution):
+            self._now = self.source.now()
+
+    def now(self) -> float:
+        return self._now
+
+    def stop(self) -> None:
+        """Stops the background thread. The clock keeps returning the last cached time"""
+        self._stopped.set()
+        self._thread.join()
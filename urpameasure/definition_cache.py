@@ -0,0 +1,229 @@
+"""Module containing read-only measurement definitions shared between processes through a memory-mapped file"""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import struct
+from types import MappingProxyType
+from typing import Any, BinaryIO, Dict, Iterator, Mapping, Optional, Tuple
+
+from .globals import *
+
+logger = logging.getLogger(__name__)
+
+# header: magic, format version, kind (Console/Sydesk), revision, number of definitions
+_HEADER = struct.Struct("<8sHHQQ")
+# index entry: key offset, key length, definition offset, definition length
+_INDEX_ENTRY = struct.Struct("<QIQI")
+_MAGIC = b"URPADEFS"
+_FORMAT_VERSION = 1
+_KINDS = ("Console", "Sydesk")
+
+
+def _read_header(file: BinaryIO) -> Tuple[bytes, int, int, int, int]:
+    """Reads header of an open definition cache file"""
+    header = file.read(_HEADER.size)
+    if len(header) != _HEADER.size:
+        return b"", 0, 0, 0, 0
+    return _HEADER.unpack(header)
+
+
+def _resolve(path: str) -> str:
+    """Returns path to the file with definitions. `path` is either the file itself or a file with its name"""
+    with open(path, "rb") as file:
+        magic = file.read(len(_MAGIC))
+        if magic == _MAGIC:
+            return path
+        name = (magic + file.read()).decode("utf-8", "replace").strip()
+    if not name or os.path.basename(name) != name:
+        return path
+    return os.path.join(os.path.dirname(path), name)
+
+
+def _open_current(path: str) -> Tuple[str, BinaryIO]:
+    """Opens the current revision of a definition cache. Returns its path and the open file"""
+    revision_path = _resolve(path)
+    try:
+        return revision_path, open(revision_path, "rb")
+    except FileNotFoundError:
+        # the revision was removed by a build after `path` was read, `path` already names a newer one
+        revision_path = _resolve(path)
+        return revision_path, open(revision_path, "rb")
+
+
+def _read_current_header(path: str) -> Tuple[bytes, int, int, int, int]:
+    """Reads header of the current revision of a definition cache. Empty header if there is none"""
+    try:
+        _, file = _open_current(path)
+    except OSError:
+        return b"", 0, 0, 0, 0
+    with file:
+        return _read_header(file)
+
+
+def _remove_old_revisions(path: str, revision: int) -> None:
+    """Removes files of revisions of the definition cache older than `revision` which are not in use"""
+    directory = os.path.dirname(path) or "."
+    prefix = f"{os.path.basename(path)}."
+    for name in os.listdir(directory):
+        # newer revisions may be just written by another build
+        if not name.startswith(prefix) or not name[len(prefix) :].isdigit() or int(name[len(prefix) :]) >= revision:
+            continue
+        old_path = os.path.join(directory, name)
+        try:
+            os.remove(old_path)
+        except OSError:
+            # still mapped by an attached process on Windows. Removed by some later build
+            logger.debug(f"File '{old_path}' of definition cache is still in use")
+
+
+class DefinitionCache(Mapping[str, Mapping[str, Any]]):
+    """Read-only table of measurement definitions (self.measurements of Console or Sydesk) stored in a file
+
+    The file is memory-mapped, so processes attached to the same file share its pages. Definitions are
+    decoded lazily on the first access to them. Definitions are read-only - the cache is rebuilt with
+    DefinitionCache.build(), which writes a new revision to its own file (`path.<revision>`) and points
+    `path` to it. Files of revisions other processes are attached to are never rewritten.
+    """
+
+    def __init__(self, path: str):
+        """Attaches to an existing definition cache file
+
+        Args:
+            path (str): path passed to DefinitionCache.build(). The current revision is attached
+
+        Raises:
+            ValueError: file is not a definition cache or it was created by an unsupported version
+        """
+        revision_path, file = _open_current(path)
+        with file:
+            magic, format_version, kind, revision, count = _read_header(file)
+            if magic != _MAGIC or format_version != _FORMAT_VERSION or kind >= len(_KINDS):
+                raise ValueError(f"File '{path}' is not a definition cache of version {_FORMAT_VERSION}")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.revision_path = revision_path
+        self.kind = _KINDS[kind]
+        self.revision = revision
+        self._count = count
+        # definitions decoded so far
+        self._definitions: Dict[str, Mapping[str, Any]] = {}
+
+    @classmethod
+    def build(cls, path: str, measurement: Any, revision: Optional[int] = None) -> DefinitionCache:
+        """Writes self.measurements of Console or Sydesk to a new revision of a definition cache and attaches to it
+
+        The revision is written to `path.<revision>` and `path` is atomically replaced by a small file with its name.
+        Processes attached to older revisions keep using them, their files are removed by a build once they are not mapped.
+        Concurrent builds write different revisions, a build never replaces `path` by an older revision.
+
+        Args:
+            path (str): path to the file
+            measurement (Union[Console, Sydesk]): object with all measurements added
+            revision (Optional[int], optional): revision of the definitions.
+                First unused revision after the current one if None. Defaults to None.
+
+        Raises:
+            ValueError: file of the revision already exists
+
+        Returns:
+            DefinitionCache: cache attached to the current revision (the new one unless a newer one was built meanwhile)
+        """
+        kind = _KINDS.index(measurement.__class__.__name__)
+        entries = sorted(
+            (str(id).encode("utf-8"), json.dumps(dict(definition)).encode("utf-8"))
+            for id, definition in measurement.measurements.items()
+        )
+        index = bytearray()
+        data = bytearray()
+        data_offset = _HEADER.size + len(entries) * _INDEX_ENTRY.size
+        for key, definition in entries:
+            key_offset = data_offset + len(data)
+            data += key
+            index += _INDEX_ENTRY.pack(key_offset, len(key), data_offset + len(data), len(definition))
+            data += definition
+        automatic_revision = revision is None
+        if revision is None:
+            magic, _, _, current_revision, _ = _read_current_header(path)
+            revision = current_revision + 1 if magic == _MAGIC else 1
+        while True:
+            revision_path = f"{path}.{revision}"
+            try:
+                # created exclusively, so a file of a revision is never rewritten - not even by a concurrent build
+                file = open(revision_path, "xb")
+                break
+            except FileExistsError:
+                if not automatic_revision:
+                    raise ValueError(f"Revision {revision} of definition cache '{path}' already exists")
+                revision += 1
+        with file:
+            file.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, kind, revision, len(entries)))
+            file.write(index)
+            file.write(data)
+        magic, _, _, current_revision, _ = _read_current_header(path)
+        if magic != _MAGIC or current_revision < revision:
+            # `path` is never memory-mapped, so it can be replaced even on Windows
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as pointer:
+                pointer.write(os.path.basename(revision_path))
+            os.replace(temporary_path, path)
+            _remove_old_revisions(path, revision)
+        return cls(path)
+
+    def _entry(self, position: int) -> Tuple[int, int, int, int]:
+        """Returns index entry at `position`"""
+        return _INDEX_ENTRY.unpack_from(self._mmap, _HEADER.size + position * _INDEX_ENTRY.size)
+
+    def _key(self, position: int) -> bytes:
+        """Returns encoded id stored at `position`"""
+        key_offset, key_length, _, _ = self._entry(position)
+        return self._mmap[key_offset : key_offset + key_length]
+
+    def _find(self, key: bytes) -> int:
+        """Binary search for position of the encoded id. Returns -1 if it is not stored"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key(low) == key:
+            return low
+        return -1
+
+    def __getitem__(self, id: str) -> Mapping[str, Any]:
+        try:
+            return self._definitions[id]
+        except KeyError:
+            pass
+        position = self._find(id.encode("utf-8")) if isinstance(id, str) else -1
+        if position < 0:
+            raise KeyError(id)
+        _, _, definition_offset, definition_length = self._entry(position)
+        definition = json.loads(self._mmap[definition_offset : definition_offset + definition_length])
+        self._definitions[id] = MappingProxyType(definition)
+        return self._definitions[id]
+
+    def __contains__(self, id: object) -> bool:
+        return id in self._definitions or (isinstance(id, str) and self._find(id.encode("utf-8")) >= 0)
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(self._count):
+            yield self._key(position).decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def is_stale(self) -> bool:
+        """Checks whether the cache was rebuilt with another revision since this cache was attached"""
+        magic, _, _, revision, _ = _read_current_header(self.path)
+        return magic != _MAGIC or revision != self.revision
+
+    def close(self) -> None:
+        """Detaches from the file"""
+        self._mmap.close()
+        self._definitions.clear()
@@ -12,6 +12,9 @@ SECONDS: str = "s"
 MINUTES: str = "m"
 HOURS: str = "h"
 
+# number of seconds in every time unit
+TIME_UNIT_SECONDS = {SECONDS: 1, MINUTES: 60, HOURS: 60 * 60}
+
 
 class MeasurementIdExistsError(KeyError):
     """Error raised when user tries to add a measurement with already existing id"""
@@ -42,3 +45,10 @@ class SourceIdTooLongError(ValueError):
 
     def __init__(self) -> None:
         super().__init__("String source_id can't be longer than 32 characters.")
+
+
+class ReadOnlyDefinitionsError(TypeError):
+    """Error raised when user tries to add or edit a measurement defined by a shared DefinitionCache"""
+
+    def __init__(self) -> None:
+        super().__init__("Measurements are defined by a read-only DefinitionCache. Rebuild the cache to change them.")
@@ -0,0 +1,143 @@
+"""Module containing scheduler re-sending measurements just before they expire"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .clock import Clock, MonotonicClock
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatScheduler:
+    """Keeps expiration of every measurement id in a single timer heap and refreshes them just before they expire
+
+    All ids due at the same time are passed to `send` in one batch. The scheduler can be driven
+    by a single background thread (start/stop) or manually by calling run_pending.
+    """
+
+    def __init__(self, send: Callable[[List[str]], None], lead_time: float = 60, clock: Optional[Clock] = None):
+        """init
+
+        Args:
+            send (Callable[[List[str]], None]): called with ids that are due to be refreshed
+            lead_time (float, optional): seconds before expiration the refresh is sent. At most half of the expiration is used. Defaults to 60.
+            clock (Optional[Clock], optional): time source of the scheduler. MonotonicClock if None. Defaults to None.
+        """
+        if lead_time < 0:
+            raise ValueError(f"Lead time can't be negative, not '{lead_time}'")
+        self.send = send
+        self.lead_time = lead_time
+        self.clock = clock or MonotonicClock()
+        # heap of (due time, id). Entries whose due time differs from self._due[id] are stale and skipped
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}
+        self._expirations: Dict[str, float] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def _push(self, id: str, now: float) -> None:
+        """Pushes next refresh of id to the heap. Must be called with self._condition acquired"""
+        expiration = self._expirations[id]
+        due = now + expiration - min(self.lead_time, expiration / 2)
+        self._due[id] = due
+        heapq.heappush(self._heap, (due, id))
+
+    def schedule(self, id: str, expiration: float) -> None:
+        """Schedules refresh of id which was just written with `expiration`
+
+        Args:
+            id (str): unique id of the measurement
+            expiration (float): expiration of the written measurement in seconds. The id is unscheduled if not positive
+        """
+        with self._condition:
+            if expiration <= 0:
+                self._unschedule(id)
+                return
+            self._expirations[id] = expiration
+            self._push(id, self.clock.now())
+            if self._heap[0][1] == id:
+                # the new refresh is the earliest one, wake up the background thread
+                self._condition.notify()
+
+    def _unschedule(self, id: str) -> None:
+        """Removes id from the schedule. Must be called with self._condition acquired"""
+        self._expirations.pop(id, None)
+        self._due.pop(id, None)
+
+    def unschedule(self, id: str) -> None:
+        """Stops refreshing id
+
+        Args:
+            id (str): unique id of the measurement
+        """
+        with self._condition:
+            self._unschedule(id)
+
+    def _pop_due(self, now: float) -> List[str]:
+        """Pops ids due at `now` and schedules their next refresh. Must be called with self._condition acquired"""
+        due_ids = []
+        while self._heap and self._heap[0][0] <= now:
+            due, id = heapq.heappop(self._heap)
+            if self._due.get(id) == due:
+                due_ids.append(id)
+        for id in due_ids:
+            self._push(id, now)
+        return due_ids
+
+    def next_due(self) -> Optional[float]:
+        """Returns time of the earliest scheduled refresh or None if nothing is scheduled"""
+        with self._condition:
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def run_pending(self) -> int:
+        """Sends all refreshes that are due in one batch
+
+        Returns:
+            int: number of refreshed ids
+        """
+        with self._condition:
+            due_ids = self._pop_due(self.clock.now())
+        if due_ids:
+            self.send(due_ids)
+        return len(due_ids)
+
+    def _run(self) -> None:
+        """Loop of the background thread"""
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                due_ids = self._pop_due(self.clock.now())
+                if not due_ids:
+                    timeout = self._heap[0][0] - self.clock.now() if self._heap else None
+                    self._condition.wait(timeout)
+                    continue
+            try:
+                self.send(due_ids)
+            except Exception:
+                logger.exception(f"Heartbeat refresh of {due_ids} failed")
+
+    def start(self) -> None:
+        """Starts the background thread sending refreshes"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="urpameasure-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the background thread"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
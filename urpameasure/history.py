@@ -0,0 +1,278 @@
+"""Module containing local measurement history used for rolling-window queries"""
+
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import struct
+from array import array
+from collections import deque
+from typing import Any, BinaryIO, Deque, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from .globals import *
+
+logger = logging.getLogger(__name__)
+
+# header of a persisted ring buffer: magic, capacity, number of stored values, total number of appended values
+_HEADER = struct.Struct("<8sQQQ")
+_MAGIC = b"URPAHIST"
+_VALUE_SIZE = array("d").itemsize
+
+
+class RingBuffer:
+    """Fixed size buffer of float values which overwrites its oldest values when full
+
+    Values are kept in a preallocated array of doubles. If `path` is provided the array lives
+    in a memory-mapped file so the history survives robot restarts.
+    """
+
+    def __init__(self, capacity: int, path: Optional[str] = None):
+        """init
+
+        Args:
+            capacity (int): maximum number of values kept in the buffer
+            path (Optional[str], optional): file the buffer is persisted to. Kept in memory only if None. Defaults to None.
+
+        Raises:
+            ValueError: capacity is not a positive number or persisted file was created with different capacity
+        """
+        if capacity < 1:
+            raise ValueError(f"Capacity of the history must be a positive number, not '{capacity}'")
+        self.capacity = capacity
+        self.path = path
+        self._mmap: Optional[mmap.mmap] = None
+        self._file: Optional[BinaryIO] = None
+        self._length = 0
+        # number of values ever appended. Used as a sequence number for the min/max queues
+        self._appended = 0
+        # memoryview of doubles, either over an array or over the memory-mapped file
+        self._values: Any
+        if path is None:
+            self._values = memoryview(array("d", bytes(capacity * _VALUE_SIZE)))
+        else:
+            self._values = self._open_file(path)
+        # monotonic queues of (sequence number, value) giving O(1) min/max of the values in the buffer
+        self._min_queue: Deque[Tuple[int, float]] = deque()
+        self._max_queue: Deque[Tuple[int, float]] = deque()
+        self._sum = 0.0
+        self._rebuild_aggregates()
+
+    def _open_file(self, path: str) -> Any:
+        """Opens (or creates) memory-mapped file with persisted history
+
+        Args:
+            path (str): path to the file
+
+        Raises:
+            ValueError: file is not a history file or it was created with different capacity
+
+        Returns:
+            memoryview: view of the stored values
+        """
+        size = _HEADER.size + self.capacity * _VALUE_SIZE
+        if not os.path.isfile(path):
+            with open(path, "wb") as file:
+                file.write(_HEADER.pack(_MAGIC, self.capacity, 0, 0))
+                file.write(bytes(self.capacity * _VALUE_SIZE))
+        self._file = open(path, "r+b")
+        header = self._file.read(_HEADER.size)
+        magic, capacity, length, appended = _HEADER.unpack(header) if len(header) == _HEADER.size else (b"", 0, 0, 0)
+        if magic != _MAGIC or capacity != self.capacity or os.path.getsize(path) != size:
+            self.close()
+            raise ValueError(f"File '{path}' is not a history file with capacity {self.capacity}")
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._length = length
+        self._appended = appended
+        return memoryview(self._mmap)[_HEADER.size :].cast("d")
+
+    def _rebuild_aggregates(self) -> None:
+        """Recomputes running sum and min/max queues from stored values (used after loading a file)"""
+        first_sequence = self._appended - self._length
+        for offset, value in enumerate(self.values()):
+            self._push_aggregates(first_sequence + offset, value)
+            self._sum += value
+
+    def _push_aggregates(self, sequence: int, value: float) -> None:
+        """Pushes value to the min/max queues and drops values which fell out of the buffer"""
+        while self._min_queue and self._min_queue[-1][1] >= value:
+            self._min_queue.pop()
+        self._min_queue.append((sequence, value))
+        while self._max_queue and self._max_queue[-1][1] <= value:
+            self._max_queue.pop()
+        self._max_queue.append((sequence, value))
+        oldest_sequence = sequence - self.capacity + 1
+        if self._min_queue[0][0] < oldest_sequence:
+            self._min_queue.popleft()
+        if self._max_queue[0][0] < oldest_sequence:
+            self._max_queue.popleft()
+
+    def append(self, value: float) -> None:
+        """Appends a value to the buffer, overwriting the oldest one if the buffer is full
+
+        Args:
+            value (float): value to be appended
+        """
+        value = float(value)
+        index = self._appended % self.capacity
+        if self._length == self.capacity:
+            self._sum -= self._values[index]
+        else:
+            self._length += 1
+        self._values[index] = value
+        self._sum += value
+        self._push_aggregates(self._appended, value)
+        self._appended += 1
+        if self._mmap is not None:
+            _HEADER.pack_into(self._mmap, 0, _MAGIC, self.capacity, self._length, self._appended)
+
+    def values(self) -> List[float]:
+        """Returns stored values ordered from the oldest to the newest
+
+        Returns:
+            List[float]: stored values
+        """
+        start = (self._appended - self._length) % self.capacity
+        return [self._values[(start + offset) % self.capacity] for offset in range(self._length)]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def min(self) -> Optional[float]:
+        """Returns the smallest stored value or None if the buffer is empty"""
+        return self._min_queue[0][1] if self._length else None
+
+    def max(self) -> Optional[float]:
+        """Returns the largest stored value or None if the buffer is empty"""
+        return self._max_queue[0][1] if self._length else None
+
+    def mean(self) -> Optional[float]:
+        """Returns mean of the stored values or None if the buffer is empty"""
+        return self._sum / self._length if self._length else None
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Returns percentile of the stored values (nearest-rank method) or None if the buffer is empty
+
+        Unlike min/max/mean this sorts the stored values, so it costs O(capacity * log(capacity)).
+
+        Args:
+            percent (float): percentile to be computed, 0 - 100
+
+        Raises:
+            ValueError: percent is not in range 0 - 100
+        """
+        if not 0 <= percent <= 100:
+            raise ValueError(f"Percentile must be in range 0 - 100, not '{percent}'")
+        if not self._length:
+            return None
+        ordered = sorted(self.values())
+        rank = max(1, -(-percent * self._length // 100))
+        return ordered[int(rank) - 1]
+
+    def close(self) -> None:
+        """Flushes and closes the memory-mapped file (if any)"""
+        if self._mmap is not None:
+            self._values.release()
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class MeasurementHistory:
+    """Local store of written measurement values. Keeps one RingBuffer per measurement id"""
+
+    def __init__(self, capacity: int = 100, directory: Optional[str] = None):
+        """init
+
+        Args:
+            capacity (int, optional): number of values kept for each measurement. Defaults to 100.
+            directory (Optional[str], optional): directory for memory-mapped history files. History is kept in memory only if None. Defaults to None.
+        """
+        if capacity < 1:
+            raise ValueError(f"Capacity of the history must be a positive number, not '{capacity}'")
+        self.capacity = capacity
+        self.directory = directory
+        self.buffers: Dict[str, RingBuffer] = {}
+
+    def _get_path(self, id: str) -> Optional[str]:
+        """Returns path of the history file of measurement id or None if history is kept in memory only"""
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, quote(id, safe="") + ".history")
+
+    def _find_buffer(self, id: str) -> Optional[RingBuffer]:
+        """Returns buffer for measurement id. Loads it from file if it exists. Never creates a new buffer
+
+        Returns:
+            Optional[RingBuffer]: buffer or None if nothing was recorded for the measurement
+        """
+        if id not in self.buffers:
+            path = self._get_path(id)
+            if path is None or not os.path.isfile(path):
+                return None
+            self.buffers[id] = RingBuffer(self.capacity, path)
+        return self.buffers[id]
+
+    def record(self, id: str, value: float) -> None:
+        """Records a written value of the measurement
+
+        Args:
+            id (str): unique id of the measurement
+            value (float): written value
+        """
+        buffer = self._find_buffer(id)
+        if buffer is None:
+            if self.directory is not None:
+                os.makedirs(self.directory, exist_ok=True)
+            buffer = self.buffers[id] = RingBuffer(self.capacity, self._get_path(id))
+        buffer.append(value)
+
+    def values(self, id: str) -> List[float]:
+        """Returns recorded values of the measurement ordered from the oldest to the newest"""
+        buffer = self._find_buffer(id)
+        return buffer.values() if buffer is not None else []
+
+    def count(self, id: str) -> int:
+        """Returns number of recorded values of the measurement"""
+        buffer = self._find_buffer(id)
+        return len(buffer) if buffer is not None else 0
+
+    def min(self, id: str) -> Optional[float]:
+        """Returns the smallest recorded value of the measurement or None if nothing was recorded"""
+        buffer = self._find_buffer(id)
+        return buffer.min() if buffer is not None else None
+
+    def max(self, id: str) -> Optional[float]:
+        """Returns the largest recorded value of the measurement or None if nothing was recorded"""
+        buffer = self._find_buffer(id)
+        return buffer.max() if buffer is not None else None
+
+    def mean(self, id: str) -> Optional[float]:
+        """Returns mean of the recorded values of the measurement or None if nothing was recorded"""
+        buffer = self._find_buffer(id)
+        return buffer.mean() if buffer is not None else None
+
+    def percentile(self, id: str, percent: float) -> Optional[float]:
+        """Returns percentile of the recorded values of the measurement or None if nothing was recorded
+
+        Args:
+            id (str): unique id of the measurement
+            percent (float): percentile to be computed, 0 - 100
+
+        Raises:
+            ValueError: percent is not in range 0 - 100
+        """
+        if not 0 <= percent <= 100:
+            raise ValueError(f"Percentile must be in range 0 - 100, not '{percent}'")
+        buffer = self._find_buffer(id)
+        return buffer.percentile(percent) if buffer is not None else None
+
+    def close(self) -> None:
+        """Closes all memory-mapped history files"""
+        for buffer in self.buffers.values():
+            buffer.close()
+        self.buffers.clear()
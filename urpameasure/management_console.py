@@ -1,21 +1,40 @@
 """Module containing class for Management Console measurements"""
 
 from __future__ import annotations
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 import logging
 
 import urpa
 from .urpameasure import Urpameasure
+from .history import MeasurementHistory
+from .definition_cache import DefinitionCache
+from .clock import Clock
 from .globals import *
-from .utils import check_valid_status, check_name, check_unit
+from .utils import check_valid_status, check_name, check_unit, compile_status_rule
 
 logger = logging.getLogger(__name__)
 
+# keys of self.measurements[id] the status rule is compiled from
+_THRESHOLD_KEYS = ("warning_above", "error_above", "warning_below", "error_below")
+
 
 class Console(Urpameasure):
-    def __init__(self):
-        """init"""
-        super().__init__()
+    def __init__(
+        self,
+        history: Optional[MeasurementHistory] = None,
+        definitions: Optional[DefinitionCache] = None,
+        clock: Optional[Clock] = None,
+    ):
+        """init
+
+        Args:
+            history (Optional[MeasurementHistory], optional): local store every written value is recorded to. Defaults to None.
+            definitions (Optional[DefinitionCache], optional): shared read-only definitions used as self.measurements. Defaults to None.
+            clock (Optional[Clock], optional): time source of measure_time. WallClock if None. Defaults to None.
+        """
+        super().__init__(history, definitions, clock)
+        # (thresholds, compiled status rule) cached by measurement id (see utils.compile_status_rule)
+        self._status_rules: Dict[str, Tuple[Dict[str, Any], Optional[Callable[[float, float], str]]]] = {}
 
     def add(
         self,
@@ -28,6 +47,10 @@ class Console(Urpameasure):
         default_description: Optional[str] = None,
         default_precision: Optional[int] = None,
         strict_mode: bool = True,
+        warning_above: Optional[float] = None,
+        error_above: Optional[float] = None,
+        warning_below: Optional[float] = None,
+        error_below: Optional[float] = None,
     ) -> None:
         """Adds a new measurement to self.measurements
 
@@ -41,16 +64,24 @@ class Console(Urpameasure):
             default_description (Optional[str], optional): description to be written to Console if none provided. Defaults to None.
             default_precision (Optional[int], optional): precision to be written to Console if none provided. Defaults to None.
             strict_mode (bool, optional): name must start with a digit if enabled. Defaults to True.
+            warning_above (Optional[float], optional): status WARNING is written if value is above this threshold and no status is provided. Defaults to None.
+            error_above (Optional[float], optional): status ERROR is written if value is above this threshold and no status is provided. Defaults to None.
+            warning_below (Optional[float], optional): status WARNING is written if value is below this threshold and no status is provided. Defaults to None.
+            error_below (Optional[float], optional): status ERROR is written if value is below this threshold and no status is provided. Defaults to None.
 
         Raises:
+            ReadOnlyDefinitionsError: measurements are defined by a read-only DefinitionCache
             MeasurementIdExistsError: attempted to add a measurement with id that already exists
-            ValueError: name does not start with a digit in strict mode
+            ValueError: name does not start with a digit in strict mode or warning threshold is beyond error threshold
         """
+        self._check_definitions_writable()
         check_valid_status(default_status)
         if id in self.measurements:
             raise MeasurementIdExistsError(id)
         check_name(default_name, strict_mode)
         check_unit(default_unit)
+        # invalid thresholds are never stored
+        compile_status_rule(warning_above, error_above, warning_below, error_below)
         self.measurements[id] = {
             "default_name": default_name,
             "default_status": default_status,
@@ -59,8 +90,59 @@ class Console(Urpameasure):
             "default_tolerance": default_tolerance,
             "default_description": default_description,
             "default_precision": default_precision,
+            "warning_above": warning_above,
+            "error_above": error_above,
+            "warning_below": warning_below,
+            "error_below": error_below,
         }
 
+    def edit_default_value(
+        self, id: str, value_key: str, new_value: Union[str, int, float, None], strict_mode: bool = True
+    ) -> None:
+        """Edits default value (or threshold) of an existing measurement
+
+        Args:
+            id (str): unique id of this measurement
+            value_key (str): key of the value to be edited
+            new_value (str): value of the new value
+
+        Raises:
+            ReadOnlyDefinitionsError: measurements are defined by a read-only DefinitionCache
+            InvalidMeasurementIdError: provided measurement id does not exist
+            KeyError: provided measurement id does not contain desired key
+            ValueError: warning threshold would be beyond error threshold
+        """
+        self._check_definitions_writable()
+        if value_key in _THRESHOLD_KEYS and id in self.measurements:
+            thresholds = {key: self.measurements[id][key] for key in _THRESHOLD_KEYS}
+            thresholds[value_key] = new_value
+            # compile before editing so invalid thresholds are never stored
+            compile_status_rule(**thresholds)  # type: ignore
+        super().edit_default_value(id, value_key, new_value, strict_mode)
+
+    def _get_status_rule(self, id: str) -> Optional[Callable[[float, float], str]]:
+        """Returns compiled status rule of the measurement. Compiles it again if its thresholds changed
+
+        Args:
+            id (str): unique id of the measurement
+
+        Returns:
+            Optional[Callable[[float, float], str]]: status rule or None if the measurement has no thresholds
+        """
+        this_measurement = self.measurements[id]
+        cached = self._status_rules.get(id)
+        if cached is not None:
+            thresholds, status_rule = cached
+            for key in _THRESHOLD_KEYS:
+                if this_measurement.get(key) != thresholds[key]:
+                    break
+            else:
+                return status_rule
+        thresholds = {key: this_measurement.get(key) for key in _THRESHOLD_KEYS}
+        status_rule = compile_status_rule(**thresholds)
+        self._status_rules[id] = (thresholds, status_rule)
+        return status_rule
+
     def write(
         self,
         id: str,
@@ -77,7 +159,7 @@ class Console(Urpameasure):
 
         Args:
             id (str): Unique id of this measurement
-            status (Optional[str], optional): status to be written to Console. self.measurements[id]["default_status"] is used if not provided. Defaults to None.
+            status (Optional[str], optional): status to be written to Console. If not provided it is derived from thresholds defined in self.add method, or self.measurements[id]["default_status"] is used if there are none. Defaults to None.
             name (Optional[str], optional): name to be written to Console. self.measurements[id]["default_name"] is used if not provided. Defaults to None.
             value (Optional[float], optional): value to be written to Console. self.measurements[id]["default_value"] is used if not provided. Defaults to None.
             unit (str, optional): unit to be written to Console. self.measurements[id]["default_unit"] is used if not provided. Defaults to "".
@@ -96,20 +178,34 @@ class Console(Urpameasure):
         this_measurement = self.measurements[id]
         name = name or this_measurement["default_name"]
         check_name(name, strict_mode)
+        # writes without a value only reset the measurement to its default and are not recorded to history
+        value_provided = value is not None
+        # status is derived only from provided value or tolerance, resetting to defaults writes the default status
+        derive_status = not status and (value_provided or tolerance is not None)
+        # cannot use simple 'or' for value because '0' can be valid measurement
+        value = value if value_provided else this_measurement["default_value"]
+        # cannot use simple 'or' for tolerance because '0' can be valid value for it
+        tolerance = tolerance if tolerance is not None else this_measurement["default_tolerance"]
+        if not status:
+            status_rule = self._get_status_rule(id) if derive_status else None
+            if status_rule is not None and value is not None:
+                status = status_rule(value, tolerance or 0)
+            else:
+                status = this_measurement["default_status"]
         # use either user supplied value or default value that was defined in self.add method
         urpa.write_measure(
             name=name,
-            status=status or this_measurement["default_status"],
-            # cannot use simple 'or' for value because '0' can be valid measurement
-            value=value if value is not None else this_measurement["default_value"],
+            status=status,
+            value=value,
             # cannot use simple 'or' for unit because empty string can be valid unit
             unit=this_measurement["default_unit"] if unit is None else unit,
-            # cannot use simple 'or' for tolerance because '0' can be valid value for it
-            tolerance=tolerance if tolerance is not None else this_measurement["default_tolerance"],
+            tolerance=tolerance,
             description=description or this_measurement["default_description"],
             precision=precision or this_measurement["default_precision"],
             id=id,
         )
+        if value_provided:
+            self._record_history(id, value)
 
     def _get_measured_time(self, time_unit: str) -> float:
         """Calls super's _get_measured_time method and converts its output based on 'unit'
@@ -123,26 +219,23 @@ class Console(Urpameasure):
         Returns:
             float: measured time in desired units
         """
-        time_elapsed_seconds = super()._get_measured_time()
-        if time_unit == SECONDS:
-            time_conversion_coeficient = 1
-        elif time_unit == MINUTES:
-            time_conversion_coeficient = 60
-        elif time_unit == HOURS:
-            time_conversion_coeficient = 60 * 60
-        else:
+        if time_unit not in TIME_UNIT_SECONDS:
             raise ValueError(f"Invalid time unit '{time_unit}'")
-        return time_elapsed_seconds / time_conversion_coeficient
+        return super()._get_measured_time() / TIME_UNIT_SECONDS[time_unit]
 
-    def _send_time_measure(self, id: str, value: float, status: str = INFO) -> None:
+    def _send_time_measure(self, id: str, value: float, status: Optional[str] = None) -> None:
         """Method called by measure_time decorator
 
         Args:
             id (str): unique id of the time mesurement
             value (float): time value
-            status (str): status of the time measurement to be shown in Management Console
+            status (Optional[str], optional): status of the time measurement to be shown in Management Console.
+                Derived from thresholds of the measurement if not provided, INFO if it has none. Defaults to None.
         """
-        check_valid_status(status)
+        if status is not None:
+            check_valid_status(status)
+        elif id in self.measurements and self._get_status_rule(id) is None:
+            status = INFO
         self.write(id=id, status=status, value=value)
 
     def _send_login_measure(
@@ -0,0 +1,84 @@
+"""Module containing snapshots of process resource usage (CPU time, peak RSS, I/O bytes)"""
+
+from __future__ import annotations
+
+import logging
+import sys
+import time
+from typing import NamedTuple, Optional, Tuple
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows. Peak RSS is not measured there
+    resource = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+PROC_IO_FILE_NAME: str = "/proc/self/io"
+
+
+class ResourceSnapshot(NamedTuple):
+    """Resource usage of the current process at one point of time. Values which can't be measured are None"""
+
+    cpu_time: float
+    max_rss: Optional[int]
+    read_bytes: Optional[int]
+    write_bytes: Optional[int]
+
+
+def _get_max_rss() -> Optional[int]:
+    """Returns peak resident set size of the process in bytes or None if it can't be measured"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, other platforms kilobytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _get_io_bytes() -> Tuple[Optional[int], Optional[int]]:
+    """Returns bytes read from and written to storage by the process or (None, None) if it can't be measured"""
+    read_bytes: Optional[int] = None
+    write_bytes: Optional[int] = None
+    try:
+        with open(PROC_IO_FILE_NAME, "rb") as file:
+            for line in file:
+                if line.startswith(b"read_bytes:"):
+                    read_bytes = int(line[11:])
+                elif line.startswith(b"write_bytes:"):
+                    write_bytes = int(line[12:])
+    except OSError:
+        pass
+    return read_bytes, write_bytes
+
+
+def take_resource_snapshot() -> ResourceSnapshot:
+    """Takes a snapshot of resource usage of the current process
+
+    Returns:
+        ResourceSnapshot: snapshot
+    """
+    read_bytes, write_bytes = _get_io_bytes()
+    return ResourceSnapshot(time.process_time(), _get_max_rss(), read_bytes, write_bytes)
+
+
+def resource_usage_delta(start: ResourceSnapshot, end: ResourceSnapshot) -> ResourceSnapshot:
+    """Computes resource usage between two snapshots
+
+    Args:
+        start (ResourceSnapshot): snapshot taken before
+        end (ResourceSnapshot): snapshot taken after
+
+    Returns:
+        ResourceSnapshot: CPU time in seconds, peak RSS growth, bytes read and written. None if it can't be measured
+    """
+
+    def delta(start_value: Optional[int], end_value: Optional[int]) -> Optional[int]:
+        return None if start_value is None or end_value is None else end_value - start_value
+
+    return ResourceSnapshot(
+        end.cpu_time - start.cpu_time,
+        delta(start.max_rss, end.max_rss),
+        delta(start.read_bytes, end.read_bytes),
+        delta(start.write_bytes, end.write_bytes),
+    )
@@ -3,9 +3,13 @@
 from __future__ import annotations
 
 import logging
-from typing import Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from urpameasure.globals import InvalidMeasurementIdError, MeasurementIdExistsError, SourceIdTooLongError
 from .urpameasure import Urpameasure
+from .history import MeasurementHistory
+from .definition_cache import DefinitionCache
+from .heartbeat import HeartbeatScheduler
+from .clock import Clock
 
 import urpa
 
@@ -14,10 +18,26 @@ logger = logging.getLogger(__name__)
 
 
 class Sydesk(Urpameasure):
-    def __init__(self, directory):
-        """Init"""
-        super().__init__()
+    def __init__(
+        self,
+        directory,
+        history: Optional[MeasurementHistory] = None,
+        definitions: Optional[DefinitionCache] = None,
+        clock: Optional[Clock] = None,
+    ):
+        """Init
+
+        Args:
+            directory (str): directory Sydesk measurements are written to
+            history (Optional[MeasurementHistory], optional): local store every written value is recorded to. Defaults to None.
+            definitions (Optional[DefinitionCache], optional): shared read-only definitions used as self.measurements. Defaults to None.
+            clock (Optional[Clock], optional): time source of measure_time. WallClock if None. Defaults to None.
+        """
+        super().__init__(history, definitions, clock)
         self.directory = directory
+        # last written (value, expiration, description) of every id. Re-sent by the heartbeat
+        self.last_writes: Dict[str, Tuple[float, int, str]] = {}
+        self.heartbeat: Optional[HeartbeatScheduler] = None
 
     def add(
         self,
@@ -37,9 +57,11 @@ class Sydesk(Urpameasure):
             default_description (str): Description of the measurement. Defaults to empty string.
 
         Raises:
+            ReadOnlyDefinitionsError: measurements are defined by a read-only DefinitionCache
             MeasurementIdExistsError: measurement with this id already exists
             SourceIdTooLongError: source_id is longer than 32 characters
         """
+        self._check_definitions_writable()
         if id in self.measurements:
             raise MeasurementIdExistsError(id)
 
@@ -75,13 +97,69 @@ class Sydesk(Urpameasure):
             raise InvalidMeasurementIdError(id)
 
         this_measurement = self.measurements[id]
-        urpa.write_sydesk_measure(
-            self.directory,
-            this_measurement["source_id"],
+        self._write_sydesk_measure(
+            id,
             value or this_measurement["default_value"],
             expiration or this_measurement["default_expiration"],
             description or this_measurement["default_description"],
         )
+        # writes without a value only reset the measurement to its default and are not recorded to history
+        if value:
+            self._record_history(id, value)
+
+    def _write_sydesk_measure(self, id: str, value: float, expiration: int, description: str) -> None:
+        """Writes a measurement to sydesk and schedules its refresh if heartbeat is running
+
+        Args:
+            id (str): Unique id of this measurement
+            value (float): Value to be written to Sydesk
+            expiration (int): Expiration of the measurement in Sydesk in seconds
+            description (str): Description of the measurement
+        """
+        urpa.write_sydesk_measure(self.directory, self.measurements[id]["source_id"], value, expiration, description)
+        self.last_writes[id] = (value, expiration, description)
+        if self.heartbeat is not None:
+            self.heartbeat.schedule(id, expiration)
+
+    def _refresh(self, ids: List[str]) -> None:
+        """Called by heartbeat. Re-sends last written values of measurements which are about to expire
+
+        Args:
+            ids (List[str]): ids of the measurements to be refreshed
+        """
+        for id in ids:
+            value, expiration, description = self.last_writes[id]
+            urpa.write_sydesk_measure(
+                self.directory, self.measurements[id]["source_id"], value, expiration, description
+            )
+
+    def start_heartbeat(
+        self, lead_time: float = 60, background: bool = True, clock: Optional[Clock] = None
+    ) -> HeartbeatScheduler:
+        """Starts re-sending written measurements just before they expire in Sydesk
+
+        Args:
+            lead_time (float, optional): seconds before expiration the value is re-sent. At most half of the expiration is used. Defaults to 60.
+            background (bool, optional): refresh from a background thread. If False, call self.heartbeat.run_pending() periodically. Defaults to True.
+            clock (Optional[Clock], optional): time source of the heartbeat. MonotonicClock if None. Defaults to None.
+
+        Returns:
+            HeartbeatScheduler: the heartbeat (also available as self.heartbeat)
+        """
+        self.stop_heartbeat()
+        heartbeat = HeartbeatScheduler(self._refresh, lead_time, clock)
+        for id, (_, expiration, _) in self.last_writes.items():
+            heartbeat.schedule(id, expiration)
+        self.heartbeat = heartbeat
+        if background:
+            heartbeat.start()
+        return heartbeat
+
+    def stop_heartbeat(self) -> None:
+        """Stops re-sending measurements started with start_heartbeat"""
+        if self.heartbeat is not None:
+            self.heartbeat.stop()
+            self.heartbeat = None
 
     def _send_time_measure(self, id: str, value: float, expiration: int = 0, description: Optional[str] = None) -> None:
         """Called by measure_time decorator. Sends time measurement"""
@@ -91,14 +169,20 @@ class Sydesk(Urpameasure):
         self, id: str, value: float, expiration: int = 0, description: Optional[str] = None
     ) -> None:
         """Called by measure_login decorator. Sends login measurement"""
+        self._send_derived_measure(id, value, expiration, description)
+
+    def _send_derived_measure(
+        self, id: str, value: float, expiration: int = 0, description: Optional[str] = None
+    ) -> None:
+        """Sends a value computed by urpameasure. Unlike write, value 0 is sent as is instead of the default value"""
         this_measurement = self.measurements[id]
-        urpa.write_sydesk_measure(
-            self.directory,
-            this_measurement["source_id"],
+        self._write_sydesk_measure(
+            id,
             value,
             expiration or this_measurement["default_expiration"],
             description or this_measurement["default_description"],
         )
+        self._record_history(id, value)
 
     def _get_measured_time(self, *args: Any) -> float:
         """Calls super's _get_measured_time
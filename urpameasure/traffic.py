@@ -0,0 +1,267 @@
+"""Module containing tools for recording, replaying and generating measurement traffic"""
+
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import urpa
+from .management_console import Console
+from .sydesk import Sydesk
+
+logger = logging.getLogger(__name__)
+
+CONSOLE: str = "console"
+SYDESK: str = "sydesk"
+
+# names of the urpa functions measurements are written with
+_URPA_FUNCTIONS = ("write_measure", "write_sydesk_measure")
+
+
+class Recorder:
+    """Context manager replacing urpa write functions with stand-ins recording every call to a file
+
+    Each call is stored as one JSON line: {"time": seconds since start, "function": name, "args": [...], "kwargs": {...}}
+    """
+
+    def __init__(self, path: str, forward: bool = False):
+        """init
+
+        Args:
+            path (str): file the traffic is recorded to
+            forward (bool, optional): call the original urpa function after recording the call. Defaults to False.
+        """
+        self.path = path
+        self.forward = forward
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._originals: Dict[str, Any] = {}
+        self._file: Any = None
+        self._start = 0.0
+
+    def __enter__(self) -> Recorder:
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._start = time.perf_counter()
+        for function_name in _URPA_FUNCTIONS:
+            self._originals[function_name] = getattr(urpa, function_name)
+            setattr(urpa, function_name, self._make_stand_in(function_name))
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        for function_name, original in self._originals.items():
+            setattr(urpa, function_name, original)
+        self._originals.clear()
+        self._file.close()
+
+    def _make_stand_in(self, function_name: str) -> Any:
+        """Creates function recording calls of urpa function `function_name`"""
+
+        def stand_in(*args: Any, **kwargs: Any) -> None:
+            line = json.dumps(
+                {"time": time.perf_counter() - self._start, "function": function_name, "args": args, "kwargs": kwargs},
+                default=str,
+            )
+            with self._lock:
+                self._file.write(line + "\n")
+                self.calls += 1
+            if self.forward:
+                self._originals[function_name](*args, **kwargs)
+
+        return stand_in
+
+
+def read_recording(path: str) -> List[Dict[str, Any]]:
+    """Reads calls recorded by Recorder
+
+    Args:
+        path (str): file with recorded traffic
+
+    Returns:
+        List[Dict[str, Any]]: recorded calls ordered by time
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    """Returns nearest-rank percentile of sorted values (0 for no values)"""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-percent * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+class TrafficReport:
+    """Throughput and latency of written measurements"""
+
+    def __init__(self, latencies: List[float], elapsed: float):
+        """init
+
+        Args:
+            latencies (List[float]): duration of every write in seconds
+            elapsed (float): wall time of the whole run in seconds
+        """
+        self.latencies = sorted(latencies)
+        self.elapsed = elapsed
+
+    @property
+    def writes(self) -> int:
+        """Number of written measurements"""
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        """Written measurements per second"""
+        return self.writes / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """Returns percentile of write latency in seconds
+
+        Args:
+            percent (float): percentile to be computed, 0 - 100
+        """
+        return _percentile(self.latencies, percent)
+
+    def summary(self) -> str:
+        """Returns human readable summary of the report"""
+        latencies_ms = ", ".join(f"p{percent}={self.percentile(percent) * 1000:.3f}" for percent in (50, 95, 99, 100))
+        return (
+            f"writes: {self.writes}\n"
+            f"elapsed: {self.elapsed:.3f} s\n"
+            f"throughput: {self.throughput:.1f} writes/s\n"
+            f"latency [ms]: {latencies_ms}"
+        )
+
+
+def replay(path: str, speed: float = 1.0, directory: Optional[str] = None) -> TrafficReport:
+    """Replays recorded traffic against Console and Sydesk
+
+    Measurements are added on the fly with the recorded ids (Console) or source ids (Sydesk).
+
+    Args:
+        path (str): file with traffic recorded by Recorder
+        speed (float, optional): speed multiplier of the recorded timing. 0 replays as fast as possible. Defaults to 1.0.
+        directory (Optional[str], optional): overrides recorded Sydesk directory. Defaults to None.
+
+    Raises:
+        ValueError: speed is negative or recording contains unknown function
+
+    Returns:
+        TrafficReport: throughput and latency of the replayed writes
+    """
+    if speed < 0:
+        raise ValueError(f"Speed can't be negative, not '{speed}'")
+    console = Console()
+    sydesks: Dict[str, Sydesk] = {}
+    latencies = []
+    start = time.perf_counter()
+    for call in read_recording(path):
+        if speed:
+            delay = start + call["time"] / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if call["function"] == "write_measure":
+            kwargs = dict(call["kwargs"])
+            id = kwargs.pop("id")
+            if id not in console.measurements:
+                console.add(id, strict_mode=False)
+            write_start = time.perf_counter()
+            console.write(id, strict_mode=False, **kwargs)
+        elif call["function"] == "write_sydesk_measure":
+            recorded_directory, source_id, value, expiration, description = call["args"]
+            sydesk_directory = directory or recorded_directory
+            if sydesk_directory not in sydesks:
+                sydesks[sydesk_directory] = Sydesk(sydesk_directory)
+            sydesk = sydesks[sydesk_directory]
+            if source_id not in sydesk.measurements:
+                sydesk.add(source_id, source_id)
+            write_start = time.perf_counter()
+            sydesk.write(source_id, value, expiration, description)
+        else:
+            raise ValueError(f"Unknown recorded function '{call['function']}'")
+        latencies.append(time.perf_counter() - write_start)
+    return TrafficReport(latencies, time.perf_counter() - start)
+
+
+def _generate_load_worker(
+    ids: List[str], rate: float, duration: float, target: str, directory: str
+) -> Tuple[List[float], float]:
+    """Writes every id in `ids` `rate` times per second for `duration` seconds
+
+    Returns:
+        Tuple[List[float], float]: latencies of all writes and elapsed time
+    """
+    measurement: Any = Console() if target == CONSOLE else Sydesk(directory)
+    for id in ids:
+        if target == CONSOLE:
+            measurement.add(id, default_name=f"0 {id}")
+        else:
+            measurement.add(id, id[:32])
+    latencies = []
+    start = time.perf_counter()
+    tick = 0
+    while tick / rate < duration:
+        due = start + tick / rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        for id in ids:
+            write_start = time.perf_counter()
+            measurement.write(id, value=tick)
+            latencies.append(time.perf_counter() - write_start)
+        tick += 1
+    # the last tick covers the time until the end of the load
+    delay = start + duration - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+    return latencies, time.perf_counter() - start
+
+
+def generate_load(
+    ids: int = 10,
+    rate: float = 1.0,
+    duration: float = 10.0,
+    workers: int = 1,
+    processes: bool = False,
+    target: str = CONSOLE,
+    directory: str = ".",
+) -> TrafficReport:
+    """Generates synthetic measurement traffic: `ids` measurements written `rate` times per second each
+
+    Measurements are split between `workers` threads (or processes), each with its own Console/Sydesk instance.
+
+    Args:
+        ids (int, optional): number of measurement ids. Defaults to 10.
+        rate (float, optional): writes per second of every id. Defaults to 1.0.
+        duration (float, optional): duration of the load in seconds. Defaults to 10.0.
+        workers (int, optional): number of threads or processes. Defaults to 1.
+        processes (bool, optional): use processes instead of threads. Defaults to False.
+        target (str, optional): CONSOLE or SYDESK. Defaults to CONSOLE.
+        directory (str, optional): Sydesk directory. Defaults to ".".
+
+    Raises:
+        ValueError: invalid target or non-positive ids, rate or workers
+
+    Returns:
+        TrafficReport: throughput and latency of the generated writes
+    """
+    if target not in (CONSOLE, SYDESK):
+        raise ValueError(f"Invalid target '{target}'. Please use one of the following: '{(CONSOLE, SYDESK)}'")
+    if ids < 1 or rate <= 0 or workers < 1:
+        raise ValueError("Arguments 'ids', 'rate' and 'workers' must be positive")
+    all_ids = [f"load {index}" for index in range(ids)]
+    jobs = [(all_ids[worker::workers], rate, duration, target, directory) for worker in range(min(workers, ids))]
+    if processes:
+        with multiprocessing.Pool(len(jobs)) as pool:
+            results = pool.starmap(_generate_load_worker, jobs)
+    else:
+        with ThreadPoolExecutor(len(jobs)) as executor:
+            results = list(executor.map(lambda job: _generate_load_worker(*job), jobs))
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    # pool startup is not part of the load
+    return TrafficReport(latencies, max(elapsed for _, elapsed in results))
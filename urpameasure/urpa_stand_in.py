@@ -0,0 +1,45 @@
+"""Stand-in for the urpa module used by the command line interface when urpa can't be imported
+
+Measurements written through it are not sent anywhere. It is installed only when the interpreter runs the
+`urpameasure` command line interface (e.g. load generation or replay on machines without urpa),
+the library itself always requires urpa.
+"""
+
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+# name of the installed console script (urpameasure.exe and urpameasure-script.py on Windows)
+_SCRIPT_NAMES = ("urpameasure", "urpameasure-script")
+
+
+def write_measure(*args, **kwargs) -> None:
+    pass
+
+
+def write_sydesk_measure(*args, **kwargs) -> None:
+    pass
+
+
+def _is_command_line_interface() -> bool:
+    """Checks whether the interpreter was started to run the urpameasure command line interface"""
+    script = sys.argv[0] if sys.argv else ""
+    if script == "-m":
+        # python -m urpameasure imports the package before sys.argv[0] is set to path of its __main__.py
+        return True
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__main__.py")
+    # the path is also seen by worker processes spawned by the command line interface
+    return os.path.splitext(os.path.basename(script))[0] in _SCRIPT_NAMES or os.path.abspath(script) == main_path
+
+
+def install_for_command_line_interface() -> None:
+    """Makes `import urpa` return this module if urpa can't be imported and the command line interface is run"""
+    if not _is_command_line_interface():
+        return
+    try:
+        import urpa  # noqa: F401
+    except ImportError:
+        logger.warning("Module 'urpa' can't be imported, measurements are not sent anywhere")
+        sys.modules["urpa"] = sys.modules[__name__]
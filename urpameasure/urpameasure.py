@@ -1,26 +1,60 @@
 """Module containig base class for Console and Sydesk classes"""
 
+import atexit
 import logging
 import os
-
-import time
+import threading
+import weakref
 
 from abc import ABC, abstractmethod
+from contextlib import ContextDecorator
 from functools import wraps
-from typing import Callable, Union, Any
+from typing import Callable, Dict, List, Set, Union, Any, Optional
 
 from .globals import *
+from .clock import Clock, WallClock
+from .history import MeasurementHistory
+from .definition_cache import DefinitionCache
+from .availability import LoginStatistics
+from .resources import ResourceSnapshot, take_resource_snapshot, resource_usage_delta
 from .utils import check_valid_status, check_name
 
 logger = logging.getLogger(__name__)
 
 
 class Urpameasure(ABC):
-    def __init__(self):
-        """init"""
-        self.measurements = {}
+    def __init__(
+        self,
+        history: Optional[MeasurementHistory] = None,
+        definitions: Optional[DefinitionCache] = None,
+        clock: Optional[Clock] = None,
+    ):
+        """init
+
+        Args:
+            history (Optional[MeasurementHistory], optional): local store every written value is recorded to. Defaults to None.
+            definitions (Optional[DefinitionCache], optional): shared read-only definitions used as self.measurements. Defaults to None.
+            clock (Optional[Clock], optional): time source of measure_time. WallClock if None. Defaults to None.
 
-    def __new__(cls, *args):
+        Raises:
+            ValueError: definitions were built for another class (Console/Sydesk)
+        """
+        if definitions is not None and definitions.kind != self.__class__.__name__:
+            raise ValueError(f"Definitions were built for '{definitions.kind}', not '{self.__class__.__name__}'")
+        self.definitions = definitions
+        # measurements can't be added or edited if they come from read-only definitions
+        self.measurements: Dict[str, Dict[str, Any]] = {} if definitions is None else definitions  # type: ignore
+        self.history = history
+        # start time is stored in a file which may outlive the process, so wall clock is used by default
+        self.clock = clock or WallClock()
+        # rolling login statistics of measure_login_availability by measurement id
+        self.login_statistics: Dict[str, LoginStatistics] = {}
+        # (failures_id, mean_time_id, kwargs, interval, time of the last send) of measure_login_availability by id
+        self._login_availability: Dict[str, tuple] = {}
+        # ids of measure_login_availability with attempts recorded since the last send. Sent at exit
+        self._unsent_login_availability: Set[str] = set()
+
+    def __new__(cls, *args, **kwargs):
         """Called when creating new instance
 
         Raises:
@@ -33,6 +67,15 @@ class Urpameasure(ABC):
             raise TypeError("Base class Urpameasure can't be instantiated")
         return object.__new__(cls)
 
+    def _check_definitions_writable(self) -> None:
+        """Checks that measurements are not defined by a read-only DefinitionCache
+
+        Raises:
+            ReadOnlyDefinitionsError: measurements are defined by DefinitionCache
+        """
+        if self.definitions is not None:
+            raise ReadOnlyDefinitionsError
+
     def edit_default_value(
         self, id: str, value_key: str, new_value: Union[str, int, float, None], strict_mode: bool = True
     ) -> None:
@@ -44,10 +87,12 @@ class Urpameasure(ABC):
             new_value (str): value of the new value
 
         Raises:
+            ReadOnlyDefinitionsError: measurements are defined by a read-only DefinitionCache
             InvalidMeasurementIdError: provided measurement id does not exist
             KeyError: provided measurement id does not contain desired key
             SourceIdTooLongError: source_id is longer than 32 characters
         """
+        self._check_definitions_writable()
         if not id in self.measurements:
             raise InvalidMeasurementIdError(id)
         if not value_key in self.measurements[id].keys():
@@ -71,11 +116,21 @@ class Urpameasure(ABC):
 
         self.measurements[id][value_key] = new_value
 
+    def _record_history(self, id: str, value: Optional[float]) -> None:
+        """Records written value to self.history (if it is enabled)
+
+        Args:
+            id (str): unique id of the measurement
+            value (Optional[float]): written value. Nothing is recorded if None
+        """
+        if self.history is not None and value is not None:
+            self.history.record(id, value)
+
     def _touch_time_measure_file(self) -> None:
         """Creates a file with time value written in it"""
         if not os.path.isfile(MEASURE_TIME_FILE_NAME):
             with open(MEASURE_TIME_FILE_NAME, "w") as file:
-                file.write(str(time.time()))
+                file.write(str(self.clock.now()))
 
     def _start_time_measure(self) -> None:
         """Starts time measuring by creating measure_file"""
@@ -91,6 +146,25 @@ class Urpameasure(ABC):
         """Placeholder method to be overriden from child classes"""
         raise NotImplementedError
 
+    def _send_derived_measure(self, id: str, value: float, **kwargs: Any) -> None:
+        """Sends a value computed by urpameasure (e.g. resource usage). Accepts the same kwargs as measure_time
+
+        Args:
+            id (str): unique id of the measurement
+            value (float): value to be sent
+        """
+        self._send_time_measure(id, value, **kwargs)
+
+    def _get_elapsed_seconds(self) -> float:
+        """Reads content of the measure_file and subtracts it from current time
+
+        Returns:
+            float: elapsed time in seconds
+        """
+        with open(MEASURE_TIME_FILE_NAME, "r") as file:
+            start_value = float(file.read())
+        return self.clock.now() - start_value
+
     @abstractmethod
     def _get_measured_time(self, *args: Any) -> float:
         """Reads content of the measure_file and subtracts it from current time
@@ -101,10 +175,7 @@ class Urpameasure(ABC):
         Returns:
             float: calculated time
         """
-        with open(MEASURE_TIME_FILE_NAME, "r") as file:
-            start_value = float(file.read())
-        time_elapsed_seconds = time.time() - start_value
-        return time_elapsed_seconds
+        return self._get_elapsed_seconds()
 
     @abstractmethod
     def write(self, *args: Any, **kwargs: Any) -> None:
@@ -135,14 +206,15 @@ class Urpameasure(ABC):
         kwargs for console: status
         kwargs for sydesk: expiration, description
         """
+        time_conversion_coeficient = 1
         if time_unit != SECONDS:
             # used only for management console
             if self.__class__.__name__ != "Sydesk":
-                possible_units = (SECONDS, MINUTES, HOURS)
-                if time_unit not in possible_units:
+                if time_unit not in TIME_UNIT_SECONDS:
                     raise ValueError(
-                        f"Invalid time unit '{time_unit}'. Please use one of the following: '{possible_units}'"
+                        f"Invalid time unit '{time_unit}'. Please use one of the following: '{tuple(TIME_UNIT_SECONDS)}'"
                     )
+                time_conversion_coeficient = TIME_UNIT_SECONDS[time_unit]
             else:
                 logger.warning("Setting time_unit for Sydesk measurement has no effect. It accepts seconds only")
 
@@ -151,7 +223,7 @@ class Urpameasure(ABC):
             def inner():
                 self._start_time_measure()
                 func()
-                self._send_time_measure(id, self._get_measured_time(time_unit), **kwargs)
+                self._send_time_measure(id, self._get_elapsed_seconds() / time_conversion_coeficient, **kwargs)
                 self._remove_time_measure_file()
 
             return inner
@@ -178,3 +250,186 @@ class Urpameasure(ABC):
             return inner
 
         return wrapper
+
+    def measure_login_availability(
+        self,
+        id: str,
+        failures_id: Optional[str] = None,
+        mean_time_id: Optional[str] = None,
+        max_attempts: int = 100,
+        window: Optional[float] = None,
+        interval: float = 15 * 60,
+        **kwargs: Any,
+    ) -> Callable:
+        """decorator for measuring availability of a login over the last attempts
+        Instead of sending every attempt it keeps rolling statistics (see self.login_statistics[id])
+        and sends them at most once per `interval` seconds (see send_login_availability). The first failed attempt
+        after a successful one is sent immediately and statistics which were not sent yet are sent at exit.
+        Functions decorated with the same id share the statistics.
+        kwargs for console: status
+        kwargs for sydesk: expiration, description
+
+        Args:
+            id (str): unique id of the measurement for availability - percentage of successful attempts
+            failures_id (Optional[str], optional): id of the measurement for number of consecutive failed attempts. Defaults to None.
+            mean_time_id (Optional[str], optional): id of the measurement for mean duration of successful attempts in seconds. Defaults to None.
+            max_attempts (int, optional): number of the last attempts the statistics are computed from. Defaults to 100.
+            window (Optional[float], optional): attempts older than this number of seconds are not counted. Defaults to None.
+            interval (float, optional): minimal number of seconds between two sends. Defaults to 15 minutes.
+
+        Raises:
+            InvalidMeasurementIdError: measurement with some of provided ids does not exist
+            ValueError: id is already measured with different arguments
+        """
+        for measurement_id in (id, failures_id, mean_time_id):
+            if measurement_id is not None and measurement_id not in self.measurements:
+                raise InvalidMeasurementIdError(measurement_id)
+        if id in self._login_availability:
+            statistics = self.login_statistics[id]
+            registered = (*self._login_availability[id][:4], statistics.max_attempts, statistics.window)
+            if registered != (failures_id, mean_time_id, kwargs, interval, max_attempts, window):
+                raise ValueError(f"Login availability of '{id}' is already measured with different arguments")
+        else:
+            if not self._login_availability:
+                atexit.register(_send_unsent_login_availability, weakref.ref(self))
+            statistics = self.login_statistics[id] = LoginStatistics(max_attempts, window)
+            self._login_availability[id] = (failures_id, mean_time_id, kwargs, interval, None)
+
+        def wrapper(func):
+            @wraps(func)
+            def inner(*args, **func_kwargs):
+                start = self.clock.now()
+                try:
+                    result = func(*args, **func_kwargs)
+                except Exception as error:
+                    now = self.clock.now()
+                    statistics.record(False, now - start, now)
+                    self._send_login_availability_if_due(id, now)
+                    raise error
+                now = self.clock.now()
+                statistics.record(True, now - start, now)
+                self._send_login_availability_if_due(id, now)
+                return result
+
+            return inner
+
+        return wrapper
+
+    def _send_login_availability_if_due(self, id: str, now: float) -> None:
+        """Sends login availability if at least `interval` seconds passed since the last send or login started failing"""
+        _, _, _, interval, last_sent = self._login_availability[id]
+        first_failure = self.login_statistics[id].consecutive_failures == 1
+        if last_sent is None or now - last_sent >= interval or first_failure:
+            self.send_login_availability(id)
+        else:
+            self._unsent_login_availability.add(id)
+
+    def send_login_availability(self, id: str) -> None:
+        """Sends statistics collected by measure_login_availability decorator immediately
+
+        Args:
+            id (str): unique id of the availability measurement
+
+        Raises:
+            InvalidMeasurementIdError: measure_login_availability was not used with this id
+        """
+        if id not in self._login_availability:
+            raise InvalidMeasurementIdError(id)
+        failures_id, mean_time_id, kwargs, interval, _ = self._login_availability[id]
+        statistics = self.login_statistics[id]
+        now = self.clock.now()
+        statistics.expire(now)
+        availability = statistics.availability()
+        if availability is not None:
+            self._send_derived_measure(id, availability, **kwargs)
+        if failures_id is not None:
+            self._send_derived_measure(failures_id, statistics.consecutive_failures, **kwargs)
+        mean_time_to_login = statistics.mean_time_to_login()
+        if mean_time_id is not None and mean_time_to_login is not None:
+            self._send_derived_measure(mean_time_id, mean_time_to_login, **kwargs)
+        self._login_availability[id] = (failures_id, mean_time_id, kwargs, interval, now)
+        self._unsent_login_availability.discard(id)
+
+    def measure_resources(
+        self,
+        cpu_id: Optional[str] = None,
+        rss_id: Optional[str] = None,
+        read_id: Optional[str] = None,
+        write_id: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "ResourceMeasure":
+        """decorator (or context manager) for measuring resources used during function execution
+        Takes one resource snapshot before and one after the function and sends the differences
+        to measurements which ids are provided. Usually combined with measure_time decorator.
+        kwargs for console: status
+        kwargs for sydesk: expiration, description
+
+        Args:
+            cpu_id (Optional[str], optional): id of the measurement for CPU time in seconds. Defaults to None.
+            rss_id (Optional[str], optional): id of the measurement for peak RSS growth in bytes. Defaults to None.
+            read_id (Optional[str], optional): id of the measurement for bytes read from storage. Defaults to None.
+            write_id (Optional[str], optional): id of the measurement for bytes written to storage. Defaults to None.
+
+        Raises:
+            InvalidMeasurementIdError: measurement with some of provided ids does not exist
+        """
+        for id in (cpu_id, rss_id, read_id, write_id):
+            if id is not None and id not in self.measurements:
+                raise InvalidMeasurementIdError(id)
+        return ResourceMeasure(self, cpu_id, rss_id, read_id, write_id, **kwargs)
+
+
+class ResourceMeasure(ContextDecorator):
+    """Decorator and context manager created by Urpameasure.measure_resources"""
+
+    def __init__(
+        self,
+        measurement: Urpameasure,
+        cpu_id: Optional[str],
+        rss_id: Optional[str],
+        read_id: Optional[str],
+        write_id: Optional[str],
+        **kwargs: Any,
+    ):
+        """init"""
+        self.measurement = measurement
+        # ordered same as fields of ResourceSnapshot
+        self.ids = (cpu_id, rss_id, read_id, write_id)
+        self.kwargs = kwargs
+        # snapshots taken on enter in every thread (see _get_starts)
+        self._local = threading.local()
+
+    def _get_starts(self) -> List[ResourceSnapshot]:
+        """Returns stack of snapshots taken on enter in the current thread. The decorated function may be recursive"""
+        try:
+            return self._local.starts
+        except AttributeError:
+            starts: List[ResourceSnapshot] = []
+            self._local.starts = starts
+            return starts
+
+    def __enter__(self) -> "ResourceMeasure":
+        self._get_starts().append(take_resource_snapshot())
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        start = self._get_starts().pop()
+        # same as measure_time - nothing is sent if the function raised an exception
+        if exc_type is not None:
+            return
+        usage = resource_usage_delta(start, take_resource_snapshot())
+        for id, value in zip(self.ids, usage):
+            if id is not None and value is not None:
+                self.measurement._send_derived_measure(id, value, **self.kwargs)
+
+
+def _send_unsent_login_availability(reference: "weakref.ref[Urpameasure]") -> None:
+    """Called at exit. Sends login availability statistics which were not sent because of the interval"""
+    measurement = reference()
+    if measurement is None:
+        return
+    for id in sorted(measurement._unsent_login_availability):
+        try:
+            measurement.send_login_availability(id)
+        except Exception:
+            logger.exception(f"Sending login availability of '{id}' at exit failed")
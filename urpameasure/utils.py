@@ -1,6 +1,7 @@
 """Module containing universally used functions"""
 
 import logging
+from typing import Callable, Optional
 
 from .globals import *
 
@@ -51,3 +52,55 @@ def check_unit(unit: str) -> None:
     """
     if not isinstance(unit, str):
         raise TypeError("'unit' must be type 'str'")
+
+
+def compile_status_rule(
+    warning_above: Optional[float] = None,
+    error_above: Optional[float] = None,
+    warning_below: Optional[float] = None,
+    error_below: Optional[float] = None,
+) -> Optional[Callable[[float, float], str]]:
+    """Compiles threshold rules into a comparator deriving status from a value
+
+    The returned comparator accepts value and tolerance and returns ERROR, WARNING or SUCCESS.
+    A value is above (below) a threshold only if it exceeds it by more than the tolerance.
+    Error thresholds take precedence over warning thresholds.
+
+    Args:
+        warning_above (Optional[float], optional): WARNING if value is above this threshold. Defaults to None.
+        error_above (Optional[float], optional): ERROR if value is above this threshold. Defaults to None.
+        warning_below (Optional[float], optional): WARNING if value is below this threshold. Defaults to None.
+        error_below (Optional[float], optional): ERROR if value is below this threshold. Defaults to None.
+
+    Raises:
+        ValueError: warning threshold is beyond error threshold
+
+    Returns:
+        Optional[Callable[[float, float], str]]: comparator or None if no threshold is defined
+    """
+    if warning_above is not None and error_above is not None and warning_above > error_above:
+        raise ValueError(f"'warning_above' ({warning_above}) can't be greater than 'error_above' ({error_above})")
+    if warning_below is not None and error_below is not None and warning_below < error_below:
+        raise ValueError(f"'warning_below' ({warning_below}) can't be less than 'error_below' ({error_below})")
+    # every check is stored as (sign, sign * threshold, status) so "above" and "below" checks
+    # are both evaluated as `sign * value > sign * threshold + tolerance`
+    checks = tuple(
+        (sign, sign * threshold, status)
+        for threshold, sign, status in (
+            (error_above, 1, ERROR),
+            (error_below, -1, ERROR),
+            (warning_above, 1, WARNING),
+            (warning_below, -1, WARNING),
+        )
+        if threshold is not None
+    )
+    if not checks:
+        return None
+
+    def status_rule(value: float, tolerance: float) -> str:
+        for sign, signed_threshold, status in checks:
+            if sign * value > signed_threshold + tolerance:
+                return status
+        return SUCCESS
+
+    return status_rule